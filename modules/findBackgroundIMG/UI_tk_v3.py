@@ -19,6 +19,7 @@ class ImageGalleryApp:
         self.csv_file_path = csv_file_path
         self.image_cache = {}  # 图片缓存
         self.image_load_queue = []  # 待加载图片队列
+        self.thumbnail_paths = {}  # 原图路径 -> 提取时生成的缩略图路径
         self.loading_threads = []  # 图片加载线程列表
         self.create_ui()
 
@@ -45,6 +46,8 @@ class ImageGalleryApp:
             reader = csv.DictReader(csvfile)
             for row in reader:
                 img_path = row['Image File']
+                if row.get('Thumbnail File'):
+                    self.thumbnail_paths[img_path] = row['Thumbnail File']
                 self.image_load_queue.append(img_path)  # 将图片路径添加到加载队列
 
     def load_images_in_background(self):
@@ -61,9 +64,10 @@ class ImageGalleryApp:
             thread.join()
 
     def load_image(self, img_path):
-        """加载单个图片，并将其存储在缓存中。"""
+        """加载单个图片，并将其存储在缓存中。有提取时生成的缩略图时加载缩略图，不解码原图。"""
+        thumb_path = self.thumbnail_paths.get(img_path)
         try:
-            img = Image.open(img_path)
+            img = Image.open(thumb_path if thumb_path and os.path.exists(thumb_path) else img_path)
             img.thumbnail((200, 200), Image.LANCZOS)
             self.image_cache[img_path] = ImageTk.PhotoImage(img)
         except Exception as e:
@@ -1,219 +1,98 @@
 import os
 import sqlite3
 import sys
+import threading
 
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QScrollArea, QGridLayout, QMenu, \
-    QMessageBox
+from PyQt5.QtGui import QImageReader
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout
 
-from modules.findBackgroundIMG.utils import open_pptx
+from modules.findBackgroundIMG.deck_index import delete_image, gallery_images, table_exists, occurrence_table
+from modules.findBackgroundIMG.gallery_view import GalleryView
+from modules.findBackgroundIMG.image_verifier import verify_images
+
+
+def displayable(image_data, qt_formats):
+    """Qt 能否显示这张图片：有提取时生成的 JPEG 缩略图时总能显示；否则按记录的 img_format 判断
+    （如内容寻址保存的 .gif/.bmp/.webp），尚未检查的图片按扩展名判断。"""
+    if image_data.get('thumb_path'):
+        return True
+    img_format = image_data.get('img_format')
+    if img_format:
+        return img_format.lower() in qt_formats
+    return os.path.splitext(image_data['img_path'])[1][1:].lower() in qt_formats
 
 
 class ImageGalleryApp(QWidget):
-    def __init__(self, db_path):
+    def __init__(self, db_path, show_cache_stats=False):
         super().__init__()
+        self.show_cache_stats = show_cache_stats  # 是否显示缩略图缓存命中统计（调试用）
         self.setWindowTitle("Image Gallery")
         self.db_path = db_path
         self.images = self.load_images_from_db()
+        self.start_background_verifier()
 
         screen_size = QApplication.instance().primaryScreen().size()
         self.resize(int(screen_size.width() * 0.8), int(screen_size.height() * 0.8))
         self.create_ui()
         self.setup_connections()
-        self.pixmap_cache = {}
-        self.current_widgets = []
 
     def create_ui(self):
-        self.scroll_area = QScrollArea(self)
-        self.scroll_area.setWidgetResizable(True)
-        self.container = QWidget()
-        self.grid_layout = QGridLayout(self.container)
-        self.container.setLayout(self.grid_layout)
+        # 虚拟化的网格：只绘制可见的格子，窗口大小变化时不重建控件
+        self.gallery = GalleryView(self.images, self, show_cache_stats=self.show_cache_stats)
         layout = QVBoxLayout(self)
-        layout.addWidget(self.scroll_area)
-        self.scroll_area.setWidget(self.container)
+        layout.addWidget(self.gallery)
         self.setLayout(layout)
 
-    def clear_layout(self, layout):
-        for i in reversed(range(layout.count())):
-            widget = layout.itemAt(i).widget()
-            if widget is not None:
-                layout.removeWidget(widget)
-                widget.deleteLater()
-
-    def update_widget_with_image_data(self, vertical_layout, image_data):
-        img_path = image_data['img_path']
-        pptx_paths = image_data['pptx_paths']
-        img_hash = image_data.get('img_hash')
-
-        if vertical_layout.count() > 0:
-            label = vertical_layout.itemAt(0).widget()
-            if not isinstance(label, ClickableLabel):
-                label.deleteLater()
-                label = ClickableLabel(img_hash, img_path, self)
-                vertical_layout.insertWidget(0, label)
-        else:
-            label = ClickableLabel(img_hash, img_path, self)
-            vertical_layout.addWidget(label)
-
-        label.image_hash = img_hash
-
-        if img_path not in self.pixmap_cache:
-            pixmap = QPixmap(img_path).scaled(200, 200, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.pixmap_cache[img_path] = pixmap
-        else:
-            pixmap = self.pixmap_cache[img_path]
-        label.setPixmap(pixmap)
-
-        image_width = pixmap.width()
-
-        while vertical_layout.count() > 1:
-            widget_to_remove = vertical_layout.itemAt(1).widget()
-            vertical_layout.removeWidget(widget_to_remove)
-            widget_to_remove.deleteLater()
-
-        for pptx_path in pptx_paths:
-            pptx_btn_text = os.path.basename(pptx_path)
-            if len(pptx_btn_text) > 20:
-                pptx_btn_text = pptx_btn_text[:9] + "..." + pptx_btn_text[-7:]
-            pptx_btn = QPushButton(pptx_btn_text)
-            pptx_btn.clicked.connect(lambda checked, path=pptx_path: open_pptx(path))
-            pptx_btn.setFixedWidth(image_width)
-            vertical_layout.addWidget(pptx_btn)
-
     def load_images_from_db(self):
-        images = {}
+        # 每张图片使用它的所有PPTX文件由出现记录表联表查询得到（见 deck_index），不再逐行合并；
+        # 无法解码的图片由提取时或 image_verifier 写入的 decodable 列排除，启动时不读取任何图片文件
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        cursor.execute("SELECT img_hash, img_path, pptx_path, is_duplicate FROM image_ppt_mapping")
-        for row in cursor.fetchall():
-            img_hash, img_path, pptx_path, is_duplicate = row
-            if img_path.lower().endswith(('.png', '.jpg', '.jpeg')):
-                if QImage(img_path).isNull() or is_duplicate:
-                    print(f"Unable to load image: {img_path}")
-                    continue
-                if img_hash not in images:
-                    images[img_hash] = {'img_path': img_path, 'pptx_paths': [pptx_path]}
-                else:
-                    if pptx_path not in images[img_hash]['pptx_paths']:
-                        images[img_hash]['pptx_paths'].append(pptx_path)
+        if table_exists(cursor, occurrence_table("image_ppt_mapping")):
+            rows = gallery_images(cursor, decodable_only=True, exclude_duplicates=True)
+        else:
+            cursor.execute("SELECT img_hash, img_path, pptx_path FROM image_ppt_mapping "
+                           "WHERE NOT IFNULL(is_duplicate, 0)")
+            rows = [{'img_hash': img_hash, 'img_path': img_path, 'pptx_paths': [pptx_path]}
+                    for img_hash, img_path, pptx_path in cursor.fetchall()]
         conn.close()
-        return list(images.values())
-
-    def calculate_columns(self):
-        container_width = self.scroll_area.width()
-        item_width = 250
-        columns = max(1, container_width // item_width)
-        return columns
-
-    def populate(self):
-        self.clear_unused_widgets()
-        max_columns = self.calculate_columns()
-
-        row_number = 0
-        col_number = 0
-        for index, image_data in enumerate(self.images):
-            if index < len(self.current_widgets):
-                container_widget = self.current_widgets[index]
-            else:
-                container_widget = QWidget()
-                vertical_layout = QVBoxLayout()
-                container_widget.setLayout(vertical_layout)
-                self.current_widgets.append(container_widget)
-                self.grid_layout.addWidget(container_widget, row_number, col_number)
-
-            vertical_layout = container_widget.layout()
-            self.update_widget_with_image_data(vertical_layout, image_data)
-
-            col_number += 1
-            if col_number >= max_columns:
-                col_number = 0
-                row_number += 1
-
-        self.remove_excess_widgets(row_number, col_number, max_columns)
-
-    def clear_unused_widgets(self):
-        for i in reversed(range(len(self.current_widgets))):
-            widget = self.current_widgets[i]
-            self.grid_layout.removeWidget(widget)
-            widget.deleteLater()
-        self.current_widgets.clear()
+        qt_formats = {bytes(name).decode().lower() for name in QImageReader.supportedImageFormats()}
+        return [image_data for image_data in rows if image_data['img_path'] and displayable(image_data, qt_formats)]
 
-    def remove_excess_widgets(self, row_number, col_number, max_columns):
-        for index in range(row_number * max_columns + col_number, self.grid_layout.count()):
-            layout_item = self.grid_layout.itemAt(index)
-            if layout_item is not None:
-                widget = layout_item.widget()
-                if widget:
-                    self.grid_layout.removeWidget(widget)
-                    widget.deleteLater()
-
-    def resizeEvent(self, event):
-        self.populate()
-        super().resizeEvent(event)
-
-    def setup_connections(self):
-        pass
-
-    def delete_db_entry(self, image_hash):
+    def start_background_verifier(self):
+        """有尚未检查的图片时在后台线程中检查，结果写入数据库，下次启动时生效；本次无法加载的图片显示为不可用。"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM image_ppt_mapping WHERE img_hash=?", (image_hash,))
-        conn.commit()
+        cursor.execute("PRAGMA table_info(image_ppt_mapping)")
+        unverified = True
+        if 'decodable' in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("SELECT EXISTS(SELECT 1 FROM image_ppt_mapping WHERE decodable IS NULL)")
+            unverified = bool(cursor.fetchone()[0])
         conn.close()
+        if unverified:
+            threading.Thread(target=verify_images, args=(self.db_path,), kwargs={'workers': 2}, daemon=True).start()
 
-    def delete_image(self, image_hash):
-        img_path_to_delete = None
-        for img in self.images:
-            if img.get('img_hash') == image_hash:
-                img_path_to_delete = img.get('img_path')
-                break
+    def setup_connections(self):
+        self.gallery.deleteRequested.connect(self.on_delete_requested)
 
+    def on_delete_requested(self, image_hash):
+        self.delete_db_entry(image_hash)
         self.images = [img for img in self.images if img.get('img_hash') != image_hash]
+        self.gallery.remove_image(image_hash)
 
-        if img_path_to_delete and os.path.exists(img_path_to_delete):
-            os.remove(img_path_to_delete)
-
-        self.populate()
-
-
-class ClickableLabel(QLabel):
-    def __init__(self, image_hash, img_path, parent=None):
-        super().__init__(parent)
-        self.image_hash = image_hash
-        self.img_path = img_path
-        self.parent = parent
-
-    def copy_to_clipboard(self):
-        pixmap = QPixmap(self.img_path)
-        QApplication.clipboard().setPixmap(pixmap)
-
-    def mousePressEvent(self, event):
-        if event.button() == Qt.RightButton:
-            self.showContextMenu(event.pos())
+    def delete_db_entry(self, image_hash):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        if table_exists(cursor, occurrence_table("image_ppt_mapping")):
+            delete_image(cursor, "image_ppt_mapping", image_hash)
         else:
-            super().mousePressEvent(event)
-
-    def showContextMenu(self, position):
-        menu = QMenu()
-        copy_action = menu.addAction("复制图片")
-        delete_action = menu.addAction("删除图片")
-        action = menu.exec_(self.mapToGlobal(position))
-        if action == copy_action:
-            self.copy_to_clipboard()
-        elif action == delete_action:
-            self.deleteImage()
-
-    def deleteImage(self):
-        reply = QMessageBox.question(self, '删除确认', "你确定要删除这张图片吗？", QMessageBox.Yes | QMessageBox.No,
-                                     QMessageBox.No)
-        if reply == QMessageBox.Yes:
-            self.parent.delete_db_entry(self.image_hash)
+            cursor.execute("DELETE FROM image_ppt_mapping WHERE img_hash=?", (image_hash,))
+        conn.commit()
+        conn.close()
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    gallery_app = ImageGalleryApp("image_gallery.db")
+    gallery_app = ImageGalleryApp("image_gallery.db", show_cache_stats="--debug" in sys.argv)
     gallery_app.show()
     sys.exit(app.exec_())
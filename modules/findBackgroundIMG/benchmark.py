@@ -0,0 +1,113 @@
+# benchmark.py
+import csv
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.findBackgroundIMG.discovery import PPTXWalker
+from modules.findBackgroundIMG.synthetic_corpus import SyntheticCorpus
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计内存峰值
+    resource = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def peak_rss_mb():
+    """当前进程及其已结束的子进程（工作进程）中最大的常驻内存峰值，单位MB。"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux 上单位为KB，macOS 上为字节
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_sqlite(src_folder, work_folder, **options):
+    from modules.findBackgroundIMG.findBackgroundIMG_sqliteV1 import ImageProcessor
+    report = ImageProcessor(os.path.join(work_folder, "image_gallery.db"), src_folder,
+                            os.path.join(work_folder, "images"), None, "image_ppt_mapping", **options).run()
+    return report['images']
+
+
+def run_v2(src_folder, work_folder, **options):
+    from modules.findBackgroundIMG import findBackgroudIMG_V2
+    csv_file_path = os.path.join(work_folder, "image_ppt_mapping.csv")
+    findBackgroudIMG_V2.main(src_folder, os.path.join(work_folder, "images"), csv_file_path, **options)
+    with open(csv_file_path, newline='', encoding='utf-8') as csv_file:
+        return sum(1 for _ in csv.DictReader(csv_file))
+
+
+# 名称 -> (运行函数, 参数)；运行函数返回处理的候选图片数
+BENCHMARK_CASES = {
+    'sqlite_serial': (run_sqlite, {}),
+    'sqlite_parallel': (run_sqlite, {'workers': 4}),
+    'sqlite_pipeline': (run_sqlite, {'workers': 4, 'pipeline': True}),
+    'v2_csv': (run_v2, {}),
+}
+
+
+def run_case(runner, src_folder, work_folder, options):
+    """在独立的子进程中执行，内存峰值只包含本次运行。"""
+    # 每张图片一行的日志会明显拖慢运行，测试时只输出警告
+    logging.getLogger().setLevel(logging.WARNING)
+    start = time.perf_counter()
+    images = runner(src_folder, work_folder, **options)
+    return time.perf_counter() - start, images, peak_rss_mb()
+
+
+def run_benchmarks(corpus_folder, work_folder, cases=None, corpus=None, repeat=1):
+    """在 corpus_folder 的测试数据上依次运行各个测试用例，返回结果列表（每项为一次运行的 dict）。
+    corpus_folder 不存在时先用 corpus（默认 SyntheticCorpus()）生成。每次运行都使用新的输出目录和数据库。"""
+    if not os.path.exists(corpus_folder):
+        (corpus or SyntheticCorpus()).generate(corpus_folder)
+    files = sum(1 for _ in PPTXWalker(corpus_folder))
+    corpus_bytes = sum(stat.st_size for _, stat in PPTXWalker(corpus_folder).walk())
+
+    results = []
+    for name in cases or BENCHMARK_CASES:
+        runner, options = BENCHMARK_CASES[name]
+        for run in range(repeat):
+            case_folder = os.path.join(work_folder, name)
+            shutil.rmtree(case_folder, ignore_errors=True)
+            os.makedirs(case_folder)
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                seconds, images, rss = executor.submit(run_case, runner, corpus_folder, case_folder, options).result()
+            result = {
+                'case': name,
+                'run': run + 1,
+                'seconds': round(seconds, 3),
+                'files': files,
+                'images': images,
+                'files_per_sec': round(files / seconds, 2),
+                'images_per_sec': round(images / seconds, 2),
+                'mb_per_sec': round(corpus_bytes / seconds / 1024 / 1024, 2),
+                'peak_rss_mb': rss,
+            }
+            logging.info(f"Benchmark {name}: {result}")
+            results.append(result)
+    return results
+
+
+def print_results(results):
+    columns = ['case', 'run', 'seconds', 'files_per_sec', 'images_per_sec', 'mb_per_sec', 'peak_rss_mb']
+    print('  '.join(f"{column:>16}" for column in columns))
+    for result in results:
+        print('  '.join(f"{str(result[column]):>16}" for column in columns))
+
+
+if __name__ == "__main__":
+    corpus_folder = "synthetic_corpus"  # 测试数据目录，不存在时自动生成
+    work_folder = "benchmark_output"  # 各测试用例的输出目录
+    results_path = "benchmark_results.json"  # 结果文件，可与之前的结果比较
+
+    results = run_benchmarks(corpus_folder, work_folder, corpus=SyntheticCorpus(decks=50))
+    print_results(results)
+    with open(results_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,80 @@
+# blob_store.py
+import io
+import logging
+import os
+
+from modules.findBackgroundIMG.utils import blob_digest
+
+# 浏览器和 Qt 都能直接显示的格式按原始字节保存，不重新编码
+PASSTHROUGH_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'BMP': 'bmp',
+    'WEBP': 'webp',
+}
+# 其他格式（WMF/EMF、TIFF 等）转码为 PNG
+TRANSCODE_FORMAT = 'PNG'
+TRANSCODE_EXTENSION = 'png'
+PNG_MODES = ('1', 'L', 'LA', 'I', 'P', 'RGB', 'RGBA')
+
+
+def stored_extension(img_format):
+    """图片按 encode_for_store 保存后的扩展名。"""
+    return PASSTHROUGH_EXTENSIONS.get(img_format, TRANSCODE_EXTENSION)
+
+
+def original_extension(image_blob, img_format):
+    # PIL 把 EMF 也识别为 WMF，EMF 文件在偏移 40 处有 " EMF" 签名
+    if img_format == 'WMF' and image_blob[40:44] == b' EMF':
+        return 'emf'
+    return (img_format or 'bin').lower()
+
+
+def encode_for_store(image_blob, img):
+    """返回 (要写入文件的字节, 扩展名)。能直接显示的格式原样返回 image_blob，其他格式转码为 PNG；
+    无法转码时（例如在非 Windows 系统上解码 WMF/EMF）保留原始字节和原扩展名。"""
+    if img.format in PASSTHROUGH_EXTENSIONS:
+        return image_blob, PASSTHROUGH_EXTENSIONS[img.format]
+    try:
+        converted = img if img.mode in PNG_MODES else img.convert('RGBA' if 'A' in img.mode else 'RGB')
+        buffer = io.BytesIO()
+        converted.save(buffer, format=TRANSCODE_FORMAT)
+        return buffer.getvalue(), TRANSCODE_EXTENSION
+    except Exception as e:
+        logging.warning(f"Cannot transcode {img.format} image, keeping original bytes: {e}")
+        return image_blob, original_extension(image_blob, img.format)
+
+
+class BlobStore:
+    """
+    功能：按内容寻址保存图片：文件名为原始字节的摘要（blob_digest），按摘要前两位、三四位分片保存在
+    root/<摘要前两位>/<摘要三四位>/<摘要>.<扩展名>。能直接显示的格式写入原始字节，只有 WMF/EMF、TIFF 等格式才转码，
+    既不消耗编码时间，也不损失画质；字节相同的图片只保存一份。
+    与其他对象的关系：ImageManager 在传入 blob_store 时用 put 保存新图片，数据库 img_path 记录返回的规范路径。
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def blob_path(self, key, extension):
+        return os.path.join(self.root, key[:2], key[2:4], f"{key}.{extension}")
+
+    def put(self, image_blob, img, key=None):
+        """保存图片并返回其规范路径，key 默认为 blob_digest(image_blob)。已经存在的文件不会重复写入。"""
+        key = key or blob_digest(image_blob)
+        if img.format in PASSTHROUGH_EXTENSIONS:
+            # 原样保存的图片在写入前就能确定路径，已存在时不必再读取或转码
+            path = self.blob_path(key, PASSTHROUGH_EXTENSIONS[img.format])
+            if os.path.exists(path):
+                return path
+        data, extension = encode_for_store(image_blob, img)
+        path = self.blob_path(key, extension)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，程序中断时不会留下不完整的文件
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return path
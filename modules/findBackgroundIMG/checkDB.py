@@ -1,37 +1,190 @@
 import os
 import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
+from modules.findBackgroundIMG.blob_store import PASSTHROUGH_EXTENSIONS
+from modules.findBackgroundIMG.deck_index import occurrence_table, table_exists
 
-def check_file_paths(db_path):
+# 每个线程一次检查的路径数，以及删除记录时每次写入临时表的路径数
+STAT_CHUNK_SIZE = 1000
+DELETE_CHUNK_SIZE = 500
+# 只有这些扩展名的文件才可能是提取出的图片；数据库、CSV、.prev、.journal、.tmp 等运行产生的文件都不会被当作孤立文件
+IMAGE_EXTENSIONS = {f".{ext}" for ext in PASSTHROUGH_EXTENSIONS.values()} | {'.jpeg', '.tif', '.tiff', '.wmf', '.emf'}
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def missing_in_chunk(paths):
+    return [path for path in paths if not os.path.exists(path)]
+
+
+def check_file_paths(db_path, workers=32, table_name="image_ppt_mapping"):
+    """返回数据库中文件已不存在的 img_path 列表。路径分块后由多个线程并行检查，网络盘上也能很快完成。"""
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    cursor.execute("SELECT img_path FROM image_ppt_mapping")
-    rows = cursor.fetchall()
+    cursor.execute(f"SELECT img_path FROM {table_name}")
+    paths = [row[0] for row in cursor.fetchall() if row[0]]
+    conn.close()
 
     missing_files = []
-    for row in rows:
-        img_path = row[0]
-        if not os.path.exists(img_path):
-            missing_files.append(img_path)
-
-    conn.close()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for missing in executor.map(missing_in_chunk, chunked(paths, STAT_CHUNK_SIZE)):
+            missing_files.extend(missing)
     return missing_files
 
 
-### 步骤 2：从数据库中删除不存在的文件路径记录
+def occurrence_paths(cursor, table_name, where="", params=()):
+    """返回 [(image_id, img_path, 出现记录中的图片路径), ...]，出现记录中的路径为 img_path 所在目录下的 img_name；
+    没有出现记录表或出现记录时为 None。"""
+    occurrences = occurrence_table(table_name)
+    if not table_exists(cursor, occurrences):
+        cursor.execute(f"SELECT id, img_path, NULL FROM {table_name} i {where}", params)
+    else:
+        cursor.execute(f"SELECT i.id, i.img_path, o.img_name FROM {table_name} i "
+                       f"LEFT JOIN {occurrences} o ON o.image_id=i.id {where}", params)
+    return [(image_id, img_path, os.path.join(os.path.dirname(img_path), img_name) if img_name else None)
+            for image_id, img_path, img_name in cursor.fetchall() if img_path]
 
-def delete_missing_files_from_db(db_path, missing_files):
+
+### 步骤 2：修复或删除不存在的文件路径记录
+
+def repair_missing_paths(db_path, missing_files, table_name="image_ppt_mapping"):
+    """img_path 不存在、但同一图片的其他出现记录对应的文件仍存在时，把 img_path 改为该文件，返回仍然找不到文件的路径列表。
+    从CSV导入时 img_path 取该哈希最后一行的路径，通常是已被删除的重复文件，保留下来的文件只在出现记录中。"""
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
-    for img_path in missing_files:
-        cursor.execute("DELETE FROM image_ppt_mapping WHERE img_path = ?", (img_path,))
-        print(f"已从数据库中删除文件路径: {img_path}")
+    cursor.execute("CREATE TEMP TABLE repair_paths (img_path TEXT PRIMARY KEY)")
+    cursor.executemany("INSERT OR IGNORE INTO repair_paths (img_path) VALUES (?)", [(path,) for path in missing_files])
+    candidates = {}
+    for image_id, img_path, path in occurrence_paths(cursor, table_name,
+                                                      "WHERE i.img_path IN (SELECT img_path FROM repair_paths)"):
+        if path and path != img_path:
+            candidates.setdefault(image_id, []).append(path)
+    repaired = []
+    for image_id, paths in candidates.items():
+        existing = next((path for path in sorted(paths) if os.path.exists(path)), None)
+        if existing:
+            repaired.append((existing, image_id))
+    cursor.executemany(f"UPDATE {table_name} SET img_path=? WHERE id=?", repaired)
+    cursor.execute(f"SELECT img_path FROM {table_name} WHERE img_path IN (SELECT img_path FROM repair_paths)")
+    still_missing = [row[0] for row in cursor.fetchall()]
     conn.commit()
     conn.close()
+    print(f"已修复 {len(repaired)} 条记录的文件路径。")
+    return still_missing
+
+
+def delete_missing_files_from_db(db_path, missing_files, table_name="image_ppt_mapping"):
+    """批量删除记录：路径按块写入带主键的临时表，再用一条 DELETE 语句删除，只需扫描一遍图库表
+    （img_path 列没有索引，按块执行 DELETE ... IN (...) 时每一块都要扫描整张表）。这些图片的出现记录一并删除。"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("CREATE TEMP TABLE missing_paths (img_path TEXT PRIMARY KEY)")
+    for chunk in chunked(list(missing_files), DELETE_CHUNK_SIZE):
+        cursor.executemany("INSERT OR IGNORE INTO missing_paths (img_path) VALUES (?)", [(path,) for path in chunk])
+    if table_exists(cursor, occurrence_table(table_name)):
+        cursor.execute(f"DELETE FROM {occurrence_table(table_name)} WHERE image_id IN "
+                       f"(SELECT id FROM {table_name} WHERE img_path IN (SELECT img_path FROM missing_paths))")
+    cursor.execute(f"DELETE FROM {table_name} WHERE img_path IN (SELECT img_path FROM missing_paths)")
+    deleted = cursor.rowcount
+    conn.commit()
+    conn.close()
+    print(f"已从数据库中删除 {deleted} 条文件路径记录。")
+    return deleted
+
+
+### 步骤 3：找出图片文件夹中没有数据库记录的文件
+
+def normalize_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def list_files(folder, exclude_dirs=("thumbnails",), exclude_paths=(), extensions=IMAGE_EXTENSIONS):
+    """递归列出 folder 下扩展名在 extensions 中的文件（extensions 为 None 时列出所有文件），
+    跳过 exclude_dirs 中的目录名（默认跳过缩略图目录）和 exclude_paths 中的目录。"""
+    excluded = {normalize_path(path) for path in exclude_paths}
+    files = []
+    stack = [folder]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in exclude_dirs and normalize_path(entry.path) not in excluded:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    if extensions is None or os.path.splitext(entry.name)[1].lower() in extensions:
+                        files.append(entry.path)
+    return files
+
+
+def find_orphan_files(db_path, dest_folder, exclude_dirs=("thumbnails",), table_name="image_ppt_mapping",
+                      thumbnail_folder=None):
+    """返回 dest_folder 中没有任何数据库记录引用的图片文件列表。img_path 和出现记录对应的文件都算作被引用。
+    缩略图目录（thumbnail_folder，默认 dest_folder/thumbnails）中的文件和非图片文件不会被列出。"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    referenced = set()
+    for _, img_path, path in occurrence_paths(cursor, table_name):
+        referenced.add(normalize_path(img_path))
+        if path:
+            referenced.add(normalize_path(path))
+    conn.close()
+    exclude_paths = [thumbnail_folder or os.path.join(dest_folder, "thumbnails")]
+    return [path for path in list_files(dest_folder, exclude_dirs, exclude_paths)
+            if normalize_path(path) not in referenced]
+
+
+def remove_orphan_files(orphan_files):
+    for path in orphan_files:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"无法删除文件 {path}: {e}")
+    print(f"已删除 {len(orphan_files)} 个没有数据库记录的文件。")
+
+
+def reconcile(db_path, dest_folder=None, remove_orphans=False, workers=32, table_name="image_ppt_mapping",
+              thumbnail_folder=None, dry_run=True):
+    """核对数据库和图片文件夹：修复 img_path 指向已删除文件、但其他出现记录的文件仍存在的记录，删除确实找不到文件的记录；
+    列出没有记录的图片文件。remove_orphans 为 True 且 dry_run 为 False 时才删除这些文件，否则只列出将被删除的文件。
+    thumbnail_folder 为提取时使用的缩略图目录（ImageProcessor 的同名参数），其中的文件不会被删除。
+    返回 (missing_files, orphan_files)，missing_files 为修复后仍找不到文件、已删除记录的路径。"""
+    missing_files = check_file_paths(db_path, workers, table_name)
+    print(f"{len(missing_files)} 条记录的文件不存在。")
+    if missing_files:
+        missing_files = repair_missing_paths(db_path, missing_files, table_name)
+    if missing_files:
+        delete_missing_files_from_db(db_path, missing_files, table_name)
+
+    orphan_files = []
+    if dest_folder:
+        orphan_files = find_orphan_files(db_path, dest_folder, table_name=table_name, thumbnail_folder=thumbnail_folder)
+        print(f"{len(orphan_files)} 个文件没有数据库记录:")
+        for path in orphan_files:
+            print(path)
+        if remove_orphans and orphan_files:
+            if dry_run:
+                print(f"试运行：以上 {len(orphan_files)} 个文件将被删除，确认后加上 --apply 重新运行。")
+            else:
+                remove_orphan_files(orphan_files)
+    return missing_files, orphan_files
 
 
 if __name__ == "__main__":
     db_path = "image_gallery.db"  # 替换为你的数据库路径
+    dest_folder = "backgroundIMGsource"  # 替换为你的图片文件夹路径
+    thumbnail_folder = None  # 提取时指定了其他缩略图目录时替换为该路径
+
+    if "--reconcile" in sys.argv:
+        # 同时检查图片文件夹中没有记录的文件；加上 --remove-orphans 时列出将被删除的文件，再加上 --apply 才真正删除
+        reconcile(db_path, dest_folder, remove_orphans="--remove-orphans" in sys.argv,
+                  thumbnail_folder=thumbnail_folder, dry_run="--apply" not in sys.argv)
+        sys.exit(0)
+
     missing_files = check_file_paths(db_path)
 
     if missing_files:
@@ -39,7 +192,8 @@ if __name__ == "__main__":
         for path in missing_files:
             print(path)
 
-        # 删除数据库中不存在的文件路径记录
+        # 能从出现记录找到文件的记录改为指向该文件，其余记录从数据库中删除
+        missing_files = repair_missing_paths(db_path, missing_files)
         delete_missing_files_from_db(db_path, missing_files)
         print("已删除所有不存在的文件路径记录。")
     else:
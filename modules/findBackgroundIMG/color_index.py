@@ -0,0 +1,193 @@
+# color_index.py
+import logging
+import sqlite3
+
+import numpy as np
+from PIL import Image
+
+# 计算颜色特征前把图片缩小到的尺寸
+DESCRIPTOR_SIZE = (64, 64)
+# LAB 直方图每个通道的分箱数和范围（a、b 超出范围的值归入两端的分箱）
+HIST_BINS = (4, 4, 4)
+HIST_RANGES = ((0, 100), (-80, 80), (-80, 80))
+DOMINANT_COLORS = 4
+# 数据库中以 float16 保存：直方图 64 个值，主色 DOMINANT_COLORS 行 (L, a, b, 占比)
+DESCRIPTOR_DTYPE = np.float16
+
+# sRGB (D65) -> XYZ
+RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+D65_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def rgb_to_lab(rgb):
+    """rgb 为 (..., 3) 的 0-255 数组，返回同形状的 CIE LAB 数组。"""
+    srgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(srgb > 0.04045, ((srgb + 0.055) / 1.055) ** 2.4, srgb / 12.92)
+    xyz = linear @ RGB_TO_XYZ.T / D65_WHITE
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116 * f[..., 1] - 16
+    lab[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def color_descriptor(img):
+    """返回 (lab_histogram, dominant_colors)：归一化的 4x4x4 LAB 直方图（64维），以及按占比从大到小排列的
+    DOMINANT_COLORS 个主色，每行为 (L, a, b, 占比)，颜色不足时以0补齐。"""
+    if img.mode == 'P':
+        img = img.convert('RGBA')
+    small = img.resize(DESCRIPTOR_SIZE, Image.BILINEAR, reducing_gap=2.0).convert('RGB')
+    lab = rgb_to_lab(np.asarray(small)).reshape(-1, 3)
+
+    clipped = [np.clip(lab[:, i], low, high - 1e-6) for i, (low, high) in enumerate(HIST_RANGES)]
+    histogram, _ = np.histogramdd(np.stack(clipped, axis=1), bins=HIST_BINS, range=HIST_RANGES)
+    histogram = histogram.ravel() / len(lab)
+
+    quantized = small.quantize(colors=DOMINANT_COLORS, method=Image.MEDIANCUT)
+    # 颜色较少的图片调色板可能不足 DOMINANT_COLORS 个颜色
+    palette = np.array(quantized.getpalette()).reshape(-1, 3)
+    counts = np.bincount(np.asarray(quantized).ravel(), minlength=len(palette))
+    order = np.argsort(-counts, kind='stable')[:DOMINANT_COLORS]
+    order = order[counts[order] > 0]
+    dominant = np.zeros((DOMINANT_COLORS, 4))
+    dominant[:len(order), :3] = rgb_to_lab(palette[order])
+    dominant[:len(order), 3] = counts[order] / counts.sum()
+    return histogram, dominant
+
+
+def pack_descriptor(histogram, dominant):
+    """打包为数据库中 color_hist、dominant_colors 两列的 BLOB。"""
+    return (np.asarray(histogram, dtype=DESCRIPTOR_DTYPE).tobytes(),
+            np.asarray(dominant, dtype=DESCRIPTOR_DTYPE).tobytes())
+
+
+def image_color_columns(img):
+    """供 ImageManager 写入数据库的列 {'color_hist': ..., 'dominant_colors': ...}，无法计算时为空字典。"""
+    try:
+        color_hist, dominant_colors = pack_descriptor(*color_descriptor(img))
+    except Exception as e:
+        logging.error(f"Error calculating colour descriptor: {e}")
+        return {}
+    return {'color_hist': color_hist, 'dominant_colors': dominant_colors}
+
+
+class ColorIndex:
+    """
+    功能：按颜色和色调查找相似背景。把图库中所有图片的颜色特征一次性加载为 NumPy 矩阵，查询时用向量化计算
+    一次得到与全部图片的距离，再用 argpartition 取前 k 个，10万张图片的查询在毫秒级完成。
+    similar 以直方图的 Hellinger 距离（对开方后的直方图求欧氏距离）为主，加上按占比加权的主色 LAB 距离；
+    by_color 查找主色中包含某个颜色（按占比加权）的图片。
+    与其他对象的关系：ImageManager 在保存新图片时用 image_color_columns 计算特征并写入图库表的 color_hist、
+    dominant_colors 列；已有图片可以用 backfill 补算。
+    """
+
+    def __init__(self, img_paths, histograms, dominant_colors, color_weight=0.5):
+        self.img_paths = list(img_paths)
+        self.color_weight = color_weight  # 主色距离在综合距离中的权重
+        self.sqrt_histograms = np.sqrt(np.asarray(histograms, dtype=np.float32).reshape(len(self.img_paths), -1))
+        dominant = np.asarray(dominant_colors, dtype=np.float32).reshape(len(self.img_paths), DOMINANT_COLORS, 4)
+        self.dominant_lab = dominant[:, :, :3]
+        self.dominant_weights = dominant[:, :, 3]
+        self.position = {img_path: i for i, img_path in enumerate(self.img_paths)}
+
+    def __len__(self):
+        return len(self.img_paths)
+
+    @classmethod
+    def from_sqlite(cls, db_path, table_name='image_ppt_mapping', **kwargs):
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(f"SELECT img_path, color_hist, dominant_colors FROM {table_name} "
+                                f"WHERE color_hist IS NOT NULL AND dominant_colors IS NOT NULL").fetchall()
+        finally:
+            conn.close()
+        histograms = np.frombuffer(b''.join(row[1] for row in rows), dtype=DESCRIPTOR_DTYPE)
+        dominant_colors = np.frombuffer(b''.join(row[2] for row in rows), dtype=DESCRIPTOR_DTYPE)
+        logging.info(f"Loaded colour descriptors of {len(rows)} images.")
+        return cls([row[0] for row in rows], histograms, dominant_colors, **kwargs)
+
+    def distances(self, histogram, dominant):
+        """与索引中所有图片的综合距离。"""
+        # 开方后的直方图都是单位向量，Hellinger 距离 = sqrt(1 - 点积)，一次矩阵向量乘法即可
+        similarity = self.sqrt_histograms @ np.sqrt(np.asarray(histogram, dtype=np.float32))
+        hist_distance = np.sqrt(np.clip(1 - similarity, 0, None))
+        dominant = np.asarray(dominant, dtype=np.float32)
+        # 主色按位置比较（都按占比排序），LAB 距离除以100大致归一到 0-1
+        color_distance = np.linalg.norm(self.dominant_lab - dominant[:, :3], axis=2) / 100
+        weights = (self.dominant_weights + dominant[:, 3]) / 2
+        return hist_distance + self.color_weight * (color_distance * weights).sum(axis=1)
+
+    def similar(self, img=None, img_path=None, k=10):
+        """返回与 img（PIL 图片）或索引中的 img_path 最相似的 k 张图片 [(distance, img_path), ...]，不包含查询图片本身。"""
+        if img_path is not None and img_path in self.position:
+            i = self.position[img_path]
+            histogram = self.sqrt_histograms[i] ** 2
+            dominant = np.concatenate([self.dominant_lab[i], self.dominant_weights[i][:, None]], axis=1)
+        else:
+            histogram, dominant = color_descriptor(img if img is not None else Image.open(img_path))
+        distances = self.distances(histogram, dominant)
+        if img_path is not None and img_path in self.position:
+            distances[self.position[img_path]] = np.inf
+        return self.top_k(distances, k)
+
+    def by_color(self, rgb, k=10):
+        """返回主色中最接近 rgb（如 (20, 40, 120)）的 k 张图片，占比越大的主色越重要。"""
+        lab = rgb_to_lab(np.array(rgb, dtype=np.float64)).astype(np.float32)
+        color_distance = np.linalg.norm(self.dominant_lab - lab, axis=2)
+        weighted = color_distance + 100 * (1 - self.dominant_weights)
+        return self.top_k(weighted.min(axis=1), k)
+
+    def top_k(self, distances, k):
+        k = min(k, len(distances))
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [(float(distances[i]), self.img_paths[i]) for i in nearest if np.isfinite(distances[i])]
+
+
+def backfill(db_path, table_name='image_ppt_mapping', batch_size=500):
+    """为 color_hist 为空的已有图片补算颜色特征，优先读取缩略图。返回补算的图片数。"""
+    conn = sqlite3.connect(db_path)
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+    source = "COALESCE(thumb_medium, img_path)" if 'thumb_medium' in columns else "img_path"
+    rows = conn.execute(f"SELECT rowid, {source} FROM {table_name} WHERE color_hist IS NULL").fetchall()
+    updates = []
+    done = 0
+    for rowid, path in rows:
+        try:
+            with Image.open(path) as img:
+                updates.append(pack_descriptor(*color_descriptor(img)) + (rowid,))
+        except Exception as e:
+            logging.error(f"Error calculating colour descriptor of {path}: {e}")
+            continue
+        if len(updates) >= batch_size:
+            done += flush_updates(conn, table_name, updates)
+    done += flush_updates(conn, table_name, updates)
+    conn.close()
+    logging.info(f"Calculated colour descriptors of {done} images.")
+    return done
+
+
+def flush_updates(conn, table_name, updates):
+    conn.executemany(f"UPDATE {table_name} SET color_hist=?, dominant_colors=? WHERE rowid=?", updates)
+    conn.commit()
+    count = len(updates)
+    updates.clear()
+    return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_path = "image_gallery.db"  # 数据库文件路径
+    query_path = "backgroundIMGsource/example.jpg"  # 查询图片
+
+    backfill(db_path)
+    index = ColorIndex.from_sqlite(db_path)
+    for distance, img_path in index.similar(img_path=query_path, k=10):
+        print(f"{distance:.3f}  {img_path}")
@@ -0,0 +1,157 @@
+# deck_index.py
+import logging
+import os
+from itertools import groupby
+
+# 演示文稿表为所有图库表共用；出现记录表按图库表命名，见 occurrence_table
+DECK_TABLE = 'pptx_decks'
+
+
+def occurrence_table(image_table):
+    return f"{image_table}_occurrences"
+
+
+def table_exists(cursor, table_name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+    return cursor.fetchone() is not None
+
+
+def create_deck_tables(cursor, image_table):
+    """创建演示文稿表和出现记录表（图片 <-> 演示文稿 多对多）及其索引。
+    图库表 image_table 本身即图片表（每个 img_hash 一行），其中的 pptx_path 列保留为首次发现该图片的文件，供旧程序读取。
+    出现记录表的主键 (deck_id, image_id, img_name) 用于查询“某个文件中有哪些图片”，
+    索引 (image_id, deck_id) 用于查询“某张图片被哪些文件使用”。出现记录表首次创建时从图库表迁移已有记录。"""
+    occurrences = occurrence_table(image_table)
+    migrate = not table_exists(cursor, occurrences)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {DECK_TABLE} (
+            id INTEGER PRIMARY KEY,
+            pptx_path TEXT UNIQUE NOT NULL
+        )''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {occurrences} (
+            image_id INTEGER NOT NULL REFERENCES {image_table} (id),
+            deck_id INTEGER NOT NULL REFERENCES {DECK_TABLE} (id),
+            img_name TEXT NOT NULL,
+            PRIMARY KEY (deck_id, image_id, img_name)
+        ) WITHOUT ROWID''')
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{occurrences}_image ON {occurrences} (image_id, deck_id)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{image_table}_pptx_path ON {image_table} (pptx_path)")
+    if migrate:
+        migrate_image_ppt_mapping(cursor, image_table)
+
+
+def migrate_image_ppt_mapping(cursor, image_table):
+    """把图库表中每条记录的 pptx_path 转为演示文稿和出现记录，img_name 取图片文件名。可以重复执行。"""
+    occurrences = occurrence_table(image_table)
+    cursor.execute(f"INSERT OR IGNORE INTO {DECK_TABLE} (pptx_path) "
+                   f"SELECT DISTINCT pptx_path FROM {image_table} WHERE pptx_path IS NOT NULL")
+    cursor.execute(f"SELECT id, img_path, pptx_path FROM {image_table} WHERE pptx_path IS NOT NULL")
+    rows = [(os.path.basename(img_path or ''), pptx_path, image_id) for image_id, img_path, pptx_path in cursor.fetchall()]
+    cursor.executemany(f"INSERT OR IGNORE INTO {occurrences} (image_id, deck_id, img_name) "
+                       f"SELECT ?, id, ? FROM {DECK_TABLE} WHERE pptx_path=?",
+                       [(image_id, img_name, pptx_path) for img_name, pptx_path, image_id in rows])
+    logging.info(f"Migrated {len(rows)} image-deck references of {image_table} to {occurrences}.")
+
+
+def insert_deck_sql():
+    return f"INSERT OR IGNORE INTO {DECK_TABLE} (pptx_path) VALUES (?)"
+
+
+def insert_occurrence_sql(image_table, key='img_hash'):
+    """参数为 (img_name, pptx_path, key 列的值)。图片按 img_hash 或 img_digest 查找，演示文稿需已写入 DECK_TABLE。"""
+    return (f"INSERT OR IGNORE INTO {occurrence_table(image_table)} (image_id, deck_id, img_name) "
+            f"SELECT i.id, d.id, ? FROM {image_table} i JOIN {DECK_TABLE} d ON d.pptx_path=? WHERE i.{key}=? LIMIT 1")
+
+
+def write_occurrences(cursor, image_table, rows):
+    """rows 为 [(pptx_path, img_name, img_hash, img_digest), ...]，img_hash 为空时按 img_digest 查找图片。不提交事务。"""
+    cursor.executemany(insert_deck_sql(), [(pptx_path,) for pptx_path in {row[0] for row in rows}])
+    by_hash = [(img_name, pptx_path, img_hash) for pptx_path, img_name, img_hash, _ in rows if img_hash is not None]
+    by_digest = [(img_name, pptx_path, img_digest) for pptx_path, img_name, img_hash, img_digest in rows
+                 if img_hash is None and img_digest is not None]
+    cursor.executemany(insert_occurrence_sql(image_table, 'img_hash'), by_hash)
+    cursor.executemany(insert_occurrence_sql(image_table, 'img_digest'), by_digest)
+
+
+def delete_deck(cursor, image_table, pptx_path):
+    """删除某个文件的出现记录和演示文稿记录，以及因此不再被任何文件使用的图片记录；
+    仍被其他文件使用、但 pptx_path 列指向该文件的图片改为指向其中一个文件。不提交事务。
+    返回被删除图片的 [(img_hash, img_digest), ...]。"""
+    occurrences = occurrence_table(image_table)
+    cursor.execute(f"SELECT id FROM {DECK_TABLE} WHERE pptx_path=?", (pptx_path,))
+    row = cursor.fetchone()
+    deck_id = row[0] if row else None
+    # 迁移之前导入、没有出现记录的图片按 pptx_path 列查找
+    cursor.execute(f"SELECT image_id FROM {occurrences} WHERE deck_id=? "
+                   f"UNION SELECT id FROM {image_table} WHERE pptx_path=?", (deck_id, pptx_path))
+    image_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"DELETE FROM {occurrences} WHERE deck_id=?", (deck_id,))
+    cursor.execute(f"DELETE FROM {DECK_TABLE} WHERE id=?", (deck_id,))
+
+    removed = []
+    orphan_ids = []
+    for image_id in image_ids:
+        cursor.execute(f"SELECT img_hash, img_digest FROM {image_table} WHERE id=? AND NOT EXISTS "
+                       f"(SELECT 1 FROM {occurrences} WHERE image_id=?)", (image_id, image_id))
+        row = cursor.fetchone()
+        if row:
+            removed.append(row)
+            orphan_ids.append((image_id,))
+    cursor.executemany(f"DELETE FROM {image_table} WHERE id=?", orphan_ids)
+    cursor.execute(f"UPDATE {image_table} SET pptx_path=(SELECT d.pptx_path FROM {occurrences} o "
+                   f"JOIN {DECK_TABLE} d ON d.id=o.deck_id WHERE o.image_id={image_table}.id LIMIT 1) "
+                   f"WHERE pptx_path=?", (pptx_path,))
+    return removed
+
+
+def delete_image(cursor, image_table, img_hash):
+    """删除一张图片的记录及其出现记录。不提交事务。"""
+    cursor.execute(f"DELETE FROM {occurrence_table(image_table)} WHERE image_id IN "
+                   f"(SELECT id FROM {image_table} WHERE img_hash=?)", (img_hash,))
+    cursor.execute(f"DELETE FROM {image_table} WHERE img_hash=?", (img_hash,))
+
+
+def decks_for_image(cursor, img_hash, image_table='image_ppt_mapping'):
+    """使用该图片的所有文件路径（按 img_hash 的唯一索引和出现记录表的 image_id 索引查找）。"""
+    cursor.execute(f"SELECT DISTINCT d.pptx_path FROM {image_table} i "
+                   f"JOIN {occurrence_table(image_table)} o ON o.image_id=i.id "
+                   f"JOIN {DECK_TABLE} d ON d.id=o.deck_id WHERE i.img_hash=? ORDER BY d.pptx_path", (img_hash,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def images_in_deck(cursor, pptx_path, image_table='image_ppt_mapping'):
+    """某个文件中的所有图片 [(img_hash, img_path, img_name), ...]（按 pptx_path 的唯一索引和出现记录表的主键查找）。"""
+    cursor.execute(f"SELECT i.img_hash, i.img_path, o.img_name FROM {DECK_TABLE} d "
+                   f"JOIN {occurrence_table(image_table)} o ON o.deck_id=d.id "
+                   f"JOIN {image_table} i ON i.id=o.image_id WHERE d.pptx_path=? ORDER BY o.img_name", (pptx_path,))
+    return cursor.fetchall()
+
+
+def gallery_images(cursor, image_table='image_ppt_mapping', decodable_only=False, exclude_duplicates=False):
+    """图库界面使用的图片列表 [{'id', 'img_hash', 'img_path', 'thumb_path', 'img_format', 'pptx_paths'}, ...]，
+    由一条按图片 id 排序的联表查询得到。没有出现记录的图片使用图库表中的 pptx_path。
+    thumb_path 为提取时生成的小尺寸缩略图（thumb_small），没有时为 None，图库优先加载它而不是原图；
+    img_format 为 PIL 的格式名（如 'JPEG'），尚未检查时为 None。decodable_only 为 True 时跳过已确认无法解码的图片
+    （decodable 为 0；尚未检查的图片照常显示），exclude_duplicates 为 True 时跳过 is_duplicate 的记录，不读取任何图片文件。"""
+    cursor.execute(f"PRAGMA table_info({image_table})")
+    columns = {row[1] for row in cursor.fetchall()}
+    thumb = "i.thumb_small" if 'thumb_small' in columns else "NULL"
+    img_format = "i.img_format" if 'img_format' in columns else "NULL"
+    conditions = []
+    if decodable_only and 'decodable' in columns:
+        conditions.append("i.decodable IS NOT 0")
+    if exclude_duplicates and 'is_duplicate' in columns:
+        conditions.append("NOT IFNULL(i.is_duplicate, 0)")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor.execute(f"SELECT i.id, i.img_hash, i.img_path, {thumb}, {img_format}, COALESCE(d.pptx_path, i.pptx_path) "
+                   f"FROM {image_table} i "
+                   f"LEFT JOIN {occurrence_table(image_table)} o ON o.image_id=i.id "
+                   f"LEFT JOIN {DECK_TABLE} d ON d.id=o.deck_id{where} ORDER BY i.id")
+    images = []
+    for _, rows in groupby(cursor.fetchall(), key=lambda row: row[0]):
+        rows = list(rows)
+        pptx_paths = list(dict.fromkeys(row[5] for row in rows if row[5] is not None))
+        images.append({'id': rows[0][0], 'img_hash': rows[0][1], 'img_path': rows[0][2], 'thumb_path': rows[0][3],
+                       'img_format': rows[0][4], 'pptx_paths': pptx_paths})
+    return images
@@ -0,0 +1,144 @@
+# discovery.py
+import logging
+import os
+import queue
+import threading
+from fnmatch import fnmatchcase
+
+DEFAULT_INCLUDE = ('*.pptx',)
+# 默认跳过的文件和目录：Office 临时文件、macOS 资源文件、依赖目录、回收站和各种快照/系统目录
+DEFAULT_EXCLUDE = (
+    '~$*',
+    '._*',
+    'node_modules',
+    '.git',
+    '.Trash',
+    '.Trashes',
+    '.Trash-*',
+    '$RECYCLE.BIN',
+    'System Volume Information',
+    '.Spotlight-V100',
+    '.fseventsd',
+    '.DocumentRevisions-V100',
+    '.MobileBackups',
+    '.snapshot',
+    '.snapshots',
+    '.zfs',
+    '*.backupdb',
+)
+
+
+def matches(patterns, name, rel_path):
+    """name 或相对路径（以 / 分隔）匹配任意一个 glob 模式，不区分大小写。"""
+    name = name.lower()
+    rel_path = rel_path.lower()
+    return any(fnmatchcase(name, pattern) or fnmatchcase(rel_path, pattern) for pattern in patterns)
+
+
+class PPTXWalker:
+    """
+    功能：使用 os.scandir 遍历源目录，按 glob 规则筛选PPTX文件。规则同时匹配文件/目录名和相对于 root 的路径
+    （以 / 分隔，不区分大小写），exclude 对目录和文件都生效，被排除的目录不会进入；include 只对文件生效。
+    目录项自带的类型信息直接用于区分文件和目录，文件的 stat 来自 DirEntry.stat（Windows 上由目录列表直接提供，无需额外系统调用），
+    随路径一起返回，供 PPTXManifest.check 使用。符号链接指向的目录不会进入，避免在备份卷上出现循环。
+    workers 为1时按 os.walk 的顺序（自顶向下，先文件后子目录）逐个返回；大于1时由多个线程并行列目录，
+    找到的文件立即返回（顺序不固定），适合 Time Machine 等包含海量文件的备份卷。
+    与其他对象的关系：ImageExtractor 和 findBackgroudIMG_V2.main 用它查找需要处理的PPTX文件。
+    """
+
+    def __init__(self, root, include=None, exclude=None, workers=1, max_queued=10000):
+        self.root = root
+        self.include = tuple(pattern.lower() for pattern in (include or DEFAULT_INCLUDE))
+        self.exclude = tuple(pattern.lower() for pattern in (DEFAULT_EXCLUDE if exclude is None else exclude))
+        self.workers = max(1, int(workers or 1))
+        self.max_queued = max_queued
+        self.root_prefix = len(os.path.join(root, ''))
+
+    def __iter__(self):
+        for pptx_path, _ in self.walk():
+            yield pptx_path
+
+    def walk(self):
+        """逐个返回 (pptx_path, stat_result)。"""
+        if self.workers > 1:
+            return self.walk_parallel()
+        return self.walk_serial(self.root)
+
+    def scan_dir(self, dir_path):
+        """列出一个目录，返回 (匹配的文件 [(路径, stat)], 需要进入的子目录 [路径])。"""
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    rel_path = entry.path[self.root_prefix:].replace(os.sep, '/')
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not matches(self.exclude, entry.name, rel_path):
+                                subdirs.append(entry.path)
+                        elif (entry.is_file() and matches(self.include, entry.name, rel_path)
+                              and not matches(self.exclude, entry.name, rel_path)):
+                            files.append((entry.path, entry.stat()))
+                    except OSError as e:
+                        logging.warning(f"Cannot stat {entry.path}: {e}")
+        except OSError as e:
+            logging.warning(f"Cannot list directory {dir_path}: {e}")
+        return files, subdirs
+
+    def walk_serial(self, dir_path):
+        files, subdirs = self.scan_dir(dir_path)
+        yield from files
+        for subdir in subdirs:
+            yield from self.walk_serial(subdir)
+
+    def walk_parallel(self):
+        found = queue.Queue(maxsize=self.max_queued)
+        dirs = queue.Queue()
+        stop = threading.Event()
+        lock = threading.Lock()
+        pending = [1]  # 已入队但尚未列完的目录数，降为0时遍历结束
+        done = object()
+        dirs.put(self.root)
+
+        def put(item):
+            # 使用方提前停止时不再阻塞
+            while not stop.is_set():
+                try:
+                    found.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def worker():
+            while True:
+                dir_path = dirs.get()
+                if dir_path is None or stop.is_set():
+                    return
+                files, subdirs = self.scan_dir(dir_path)
+                with lock:
+                    pending[0] += len(subdirs)
+                for subdir in subdirs:
+                    dirs.put(subdir)
+                for item in files:
+                    put(item)
+                with lock:
+                    pending[0] -= 1
+                    finished = pending[0] == 0
+                if finished:
+                    for _ in range(self.workers):
+                        dirs.put(None)
+                    put(done)
+
+        threads = [threading.Thread(target=worker, name=f'pptx-walker-{i}', daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                item = found.get()
+                if item is done:
+                    break
+                yield item
+        finally:
+            stop.set()
+            for _ in range(self.workers):
+                dirs.put(None)
@@ -1,17 +1,30 @@
 import csv
 import imghdr
 import io
+import itertools
 import logging
 import os
+import sys
 
 import imagehash
 import pandas as pd
 from PIL import Image, UnidentifiedImageError
 from pptx import Presentation
 
+from modules.findBackgroundIMG.blob_store import encode_for_store, stored_extension
+from modules.findBackgroundIMG.discovery import PPTXWalker
+from modules.findBackgroundIMG.hashing import HashEngine
+from modules.findBackgroundIMG.manifest import PPTXManifest, UNCHANGED
+from modules.findBackgroundIMG.pptx_media import PPTXMediaReader
+from modules.findBackgroundIMG.run_journal import RunJournal
+from modules.findBackgroundIMG.thumbnails import ThumbnailStore
+
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# reduced_decode 模式下用于计算哈希的引擎：以较低分辨率解码，只有需要保存的图片才会完整解码
+REDUCED_HASH_ENGINE = HashEngine(reduced=True)
+
 
 def get_unique_hashes(csv_path):
     """使用pandas读取CSV文件，并返回所有'Is Duplicate'为0的图片hash的集合。"""
@@ -37,8 +50,9 @@ def mark_and_remove_duplicates_in_csv(file_path):
     # 保存修改后的DataFrame到新的CSV文件，或者按需处理
     df.to_csv(file_path, index=False)
 
-    # 找出所有标记为重复的文件
-    duplicates = df[df['Is Duplicate'] == 1]['Image File']
+    # 找出所有标记为重复的文件；同一演示文稿中重复出现的图片与第一次出现共用同一个文件，这些文件保留
+    kept_files = set(df[df['Is Duplicate'] == 0]['Image File'])
+    duplicates = df[(df['Is Duplicate'] == 1) & ~df['Image File'].isin(kept_files)]['Image File'].drop_duplicates()
     # 遍历并删除这些文件
     for file_path in duplicates:
         if os.path.exists(file_path):
@@ -65,43 +79,91 @@ def is_size_similar(img_width, img_height, slide_width, slide_height):
     return (abs(img_width - slide_width) < tolerance and abs(img_height - slide_height) < tolerance) or (img_width >= slide_width and img_height >= slide_height)
 
 
-def save_image(image, slide_idx, shape_idx, pptx_filename, dest_folder, csv_writer, existing_hashes):
-    """优化保存图片并记录到CSV。"""
-    try:
-        image_bytes = io.BytesIO(image.blob)
-        img = Image.open(image_bytes)
+def decode_image(image_blob, reduced_decode=False):
+    """解码图片并计算哈希，返回 (img, img_hash, file_extension)。"""
+    image_bytes = io.BytesIO(image_blob)
+    img = Image.open(image_bytes)
+    if reduced_decode:
+        hashes = REDUCED_HASH_ENGINE.hash_blob(image_blob)
+        if hashes is None:
+            raise ValueError("Cannot decode image for hashing")
+        img_hash = hashes['ahash']
+    else:
         img_hash = str(imagehash.average_hash(img))
 
-        # 直接获取图片格式，优化对GIF和TIFF的处理
-        img_format = img.format.lower()
-        if img_format in ['gif', 'tiff']:
-            file_extension = 'png'
-        else:
-            file_extension = 'jpg' if img_format == 'jpeg' else img_format
+    # 能直接显示的格式保留原扩展名，WMF/EMF、TIFF 等转码为PNG
+    file_extension = stored_extension(img.format)
+    return img, img_hash, file_extension
 
-        img_name = f"{os.path.splitext(os.path.basename(pptx_filename))[0]}_{slide_idx + 1}_{shape_idx + 1}.{file_extension}"
-        img_path = os.path.join(dest_folder, img_name)
 
-        if img_hash in existing_hashes:
-            logging.info(f"重复图片: {img_path}")
-        else:
-            # 如果是GIF或TIFF格式，保存为PNG
-            img.save(img_path, format='PNG' if file_extension == 'png' else img_format.upper())
-            logging.info(f"保存图片: {img_path}")
+def write_image(img, img_hash, file_extension, name_suffix, pptx_filename, dest_folder, csv_writer,
+                existing_hashes, saved_path=None, thumbnail_store=None, skip_existing=False, image_blob=None):
+    """保存图片并记录到CSV，返回图片路径。图片文件名为 <PPTX文件名>_<name_suffix>.<扩展名>，name_suffix 对图片形状为
+    "<幻灯片序号>_<形状序号>"，对背景为 iter_backgrounds 返回的 label。
+    image_blob 为图片原始字节，能直接显示的格式原样写入，不重新编码（见 encode_for_store）。
+    saved_path 不为空时该图片已由同一演示文稿中的其他出现位置保存，CSV记录直接指向该文件，不再复制。
+
+    传入 thumbnail_store 时为新图片生成缩略图，CSV中记录小尺寸缩略图的路径（缩略图按哈希存放，重复图片共用同一份）。
+    图片先写入临时文件再替换，目标文件存在即说明已完整写入；skip_existing 为 True（续跑时）时不再重新编码已存在的图片。
+    """
+    img_stem = f"{os.path.splitext(os.path.basename(pptx_filename))[0]}_{name_suffix}"
+    img_path = os.path.join(dest_folder, f"{img_stem}.{file_extension}")
+
+    if saved_path:
+        img_path = saved_path
+    elif img_hash in existing_hashes:
+        logging.info(f"重复图片: {img_path}")
+    elif skip_existing and os.path.exists(img_path):
+        logging.info(f"图片已存在: {img_path}")
+    else:
+        # 无法转码时 encode_for_store 保留原始字节和原扩展名，文件名使用实际写入的扩展名
+        data, file_extension = encode_for_store(image_blob, img)
+        img_path = os.path.join(dest_folder, f"{img_stem}.{file_extension}")
+        tmp_path = f"{img_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, img_path)
+        logging.info(f"保存图片: {img_path}")
+        if thumbnail_store is not None:
+            thumbnail_store.save_thumbnails(img, img_hash)
+
+    thumb_path = thumbnail_store.thumbnail_path(img_hash, 'small') if thumbnail_store is not None else ''
+    # 记录到CSV无论图片是否重复
+    csv_writer.writerow([pptx_filename, img_path, img_hash, thumb_path])
+    return img_path
 
-        # 记录到CSV无论图片是否重复
-        csv_writer.writerow([pptx_filename, img_path, img_hash])
 
+def save_media(decoded, media_part, read_blob, name_suffix, pptx_file, dest_folder, csv_writer, existing_hashes,
+               reduced_decode=False, thumbnail_store=None, skip_existing=False):
+    """保存图片在演示文稿中的一个出现位置并记录到CSV。decoded 为该演示文稿中已处理的媒体部件
+    {media_part_name: (img_hash, file_extension, 图片路径)}：同一媒体部件只在第一次出现时调用 read_blob 读取、解码并保存，
+    之后的出现位置只写一行指向该文件的CSV记录；无法解码的部件记为 None，之后的出现位置直接跳过。"""
+    try:
+        if media_part not in decoded:
+            image_blob = read_blob()
+            img, img_hash, file_extension = decode_image(image_blob, reduced_decode)
+            img_path = write_image(img, img_hash, file_extension, name_suffix, pptx_file, dest_folder, csv_writer,
+                                   existing_hashes, thumbnail_store=thumbnail_store, skip_existing=skip_existing,
+                                   image_blob=image_blob)
+            decoded[media_part] = (img_hash, os.path.splitext(img_path)[1][1:], img_path)
+        elif decoded[media_part] is not None:
+            img_hash, file_extension, saved_path = decoded[media_part]
+            write_image(None, img_hash, file_extension, name_suffix, pptx_file, dest_folder, csv_writer,
+                        existing_hashes, saved_path=saved_path, thumbnail_store=thumbnail_store,
+                        skip_existing=skip_existing)
     except UnidentifiedImageError:
-        logging.error(f"UnidentifiedImageError: Cannot identify image file in {pptx_filename}, slide {slide_idx + 1}, shape {shape_idx + 1}.")
+        decoded[media_part] = None
+        logging.error(f"UnidentifiedImageError: Cannot identify image file in {pptx_file}, image {name_suffix}.")
     except Exception as e:
         logging.error(f"Error saving image: {e}")
 
 
-def save_slide_images(pptx_file, dest_folder, csv_writer, existing_hashes):
-    """处理PPTX文件中的每个幻灯片图片。"""
+def save_slide_images(pptx_file, dest_folder, csv_writer, existing_hashes, reduced_decode=False,
+                      thumbnail_store=None, skip_existing=False):
+    """处理PPTX文件中的每个幻灯片图片。与 save_slide_images_zip 一样按媒体部件处理重复出现的图片，两者生成的CSV相同。"""
     try:
         presentation = Presentation(pptx_file)
+        decoded = {}  # 见 save_media
         for slide_idx, slide in enumerate(presentation.slides):
             for shape_idx, shape in enumerate(slide.shapes):
                 if shape.shape_type == 13:  # 图片类型
@@ -111,38 +173,176 @@ def save_slide_images(pptx_file, dest_folder, csv_writer, existing_hashes):
                     slide_height = presentation.slide_height
 
                     if is_size_similar(img_width, img_height, slide_width, slide_height):
-                        save_image(shape.image, slide_idx, shape_idx, pptx_file, dest_folder, csv_writer, existing_hashes)
+                        # 部件名与 PPTXMediaReader 返回的媒体部件名一致（不带开头的 /）
+                        media_part = slide.part.related_part(shape._pic.blip_rId).partname.lstrip('/')
+                        save_media(decoded, media_part, lambda: shape.image.blob, f"{slide_idx + 1}_{shape_idx + 1}",
+                                   pptx_file, dest_folder, csv_writer, existing_hashes, reduced_decode,
+                                   thumbnail_store, skip_existing)
+        # python-pptx 不提供背景填充的图片数据，背景直接从压缩包中读取
+        with PPTXMediaReader(pptx_file) as reader:
+            for label, media_part in reader.iter_backgrounds():
+                save_media(decoded, media_part, lambda: reader.read_media(media_part), label, pptx_file, dest_folder,
+                           csv_writer, existing_hashes, reduced_decode, thumbnail_store, skip_existing)
     except Exception as e:
         logging.error(f"Error processing {pptx_file}: {e}")
 
 
-def main(src_folder, dest_folder, csv_file_path):
-    """主函数，遍历目录，处理PPTX文件。"""
+def save_slide_images_zip(pptx_file, dest_folder, csv_writer, existing_hashes, reduced_decode=False,
+                          thumbnail_store=None, skip_existing=False):
+    """save_slide_images 的快速版本：直接读取压缩包，每个媒体部件只解码和计算哈希一次，每个出现位置仍写一行CSV。
+    幻灯片、版式和母版的图片背景也一并保存，每个版式和母版只处理一次（见 PPTXMediaReader.iter_backgrounds）。"""
+    try:
+        with PPTXMediaReader(pptx_file) as reader:
+            decoded = {}  # 见 save_media
+            pictures = ((f"{slide_idx + 1}_{shape_idx + 1}", media_part)
+                        for slide_idx, shape_idx, media_part, _, _ in reader.iter_pictures(is_size_similar))
+            for name_suffix, media_part in itertools.chain(pictures, reader.iter_backgrounds()):
+                save_media(decoded, media_part, lambda: reader.read_media(media_part), name_suffix, pptx_file,
+                           dest_folder, csv_writer, existing_hashes, reduced_decode, thumbnail_store, skip_existing)
+    except Exception as e:
+        logging.error(f"Error processing {pptx_file}: {e}")
+
+
+def load_rows_by_pptx(csv_path):
+    """读取已有CSV，按PPTX文件分组返回 {pptx_path: [[pptx_path, img_path, img_hash, thumb_path], ...]}。"""
+    rows_by_pptx = {}
+    if os.path.exists(csv_path):
+        with open(csv_path, newline='', encoding='utf-8') as csv_file:
+            for row in csv.DictReader(csv_file):
+                rows_by_pptx.setdefault(row['PPTX File'], []).append(
+                    [row['PPTX File'], row['Image File'], row['Image Hash'], row.get('Thumbnail File') or ''])
+    return rows_by_pptx
+
+
+def main(src_folder, dest_folder, csv_file_path, incremental=False, use_digest=False, fast_path=True,
+         reduced_decode=False, thumbnails=True, resume=False, walk_workers=1, exclude_patterns=None):
+    """主函数，遍历目录，处理PPTX文件。
+
+    fast_path 为 True（默认）时使用 save_slide_images_zip 直接读取压缩包，为 False 时使用基于 python-pptx 的 save_slide_images。
+    reduced_decode 为 True 时以较低分辨率解码计算哈希，重复图片不再完整解码；哈希可能与之前建立的CSV有个别位不同。
+    thumbnails 为 True 时在 dest_folder/thumbnails 下生成缩略图，路径记录在CSV的 Thumbnail File 列。
+    源文件由 PPTXWalker 查找：exclude_patterns 为跳过的文件/目录 glob 规则（None 表示 DEFAULT_EXCLUDE），
+    walk_workers 大于1时并行遍历目录，文件的处理顺序不再固定。
+
+    incremental 为 True 时使用CSV同目录下的 pptx_manifest.db 记录已处理的文件：未变化的文件直接沿用CSV中的旧记录，
+    修改过的文件重新处理，已删除的文件的记录不再写回CSV。
+
+    运行过程中上一次完整运行的CSV保存在 <csv>.prev，进度记录在 <csv>.journal（见 RunJournal），
+    每个PPTX文件的记录在处理完后才整体写入CSV。resume 为 True 且存在进度记录时，从中断处继续，
+    不会重复写入记录，也不会重新编码已保存的图片。
+    """
     if not os.path.exists(dest_folder):
         os.makedirs(dest_folder)
+    REDUCED_HASH_ENGINE.reset()
+
+    previous_csv_path = f"{csv_file_path}.prev"
+    journal = RunJournal(f"{csv_file_path}.journal")
+    resuming = resume and journal.exists()
+    if resuming and not os.path.exists(csv_file_path):
+        logging.warning(f"{csv_file_path} does not exist, discarding the journal and starting a fresh run.")
+        resuming = False
+    if resuming:
+        completed = journal.resume()
+        if os.path.getsize(csv_file_path) < journal.last_offset:
+            # 日志记录的内容没有完整写入CSV（如CSV被替换过），无法从中断处继续
+            logging.warning(f"{csv_file_path} is shorter than the journal records, starting a fresh run.")
+            journal.file.close()
+            resuming = False
+    if resuming:
+        # 丢弃中断时未完成文件的半截记录
+        with open(csv_file_path, 'r+b') as csv_file:
+            csv_file.truncate(journal.last_offset)
+    else:
+        completed = set()
+        if os.path.exists(previous_csv_path):
+            # 上一次运行中断且没有续跑：.prev 才是最后一次完整的结果，丢弃未完成的CSV
+            if os.path.exists(csv_file_path):
+                os.remove(csv_file_path)
+        elif os.path.exists(csv_file_path):
+            os.replace(csv_file_path, previous_csv_path)
+
     try:
-        existing_hashes = get_unique_hashes(csv_file_path)
+        existing_hashes = get_unique_hashes(previous_csv_path)
         print(existing_hashes)
-    except:
-        existing_hashes = None
+    except Exception as e:
+        logging.error(f"Error reading existing hashes: {e}")
+        existing_hashes = set()
 
-    with open(csv_file_path, mode='w', newline='', encoding='utf-8') as csv_file:
-        csv_writer = csv.writer(csv_file)
-        csv_writer.writerow(["PPTX File", "Image File", "Image Hash"])
+    manifest = None
+    previous_rows = {}
+    if incremental:
+        manifest_path = os.path.join(os.path.dirname(os.path.abspath(csv_file_path)), "pptx_manifest.db")
+        manifest = PPTXManifest.open(manifest_path, use_digest=use_digest)
+        # CSV会被重写，先读出旧记录，未变化的文件按遍历顺序原样写回
+        if os.path.exists(previous_csv_path):
+            previous_rows = load_rows_by_pptx(previous_csv_path)
+        else:
+            # CSV不存在时清单中的记录都已失效
+            manifest.purge_missing(src_folder, set())
+
+    process_pptx = save_slide_images_zip if fast_path else save_slide_images
+    thumbnail_store = ThumbnailStore(os.path.join(dest_folder, "thumbnails")) if thumbnails else None
+    seen_paths = set()
+    processed_paths = []
+    with open(csv_file_path, mode='a' if resuming else 'w', newline='', encoding='utf-8') as csv_file:
+        if not resuming:
+            csv.writer(csv_file).writerow(["PPTX File", "Image File", "Image Hash", "Thumbnail File"])
+            csv_file.flush()
+            journal.start(csv_file.tell())
+
+        for pptx_path, stat in PPTXWalker(src_folder, exclude=exclude_patterns, workers=walk_workers).walk():
+            # 每个文件的记录先写入内存，处理完成后整体写入CSV并记录进度
+            deck_rows = io.StringIO()
+            deck_writer = csv.writer(deck_rows)
+            if manifest is not None:
+                seen_paths.add(pptx_path)
+                status = manifest.check(pptx_path, stat)
+                if status != UNCHANGED and pptx_path in completed:
+                    processed_paths.append(pptx_path)
+                if status == UNCHANGED or pptx_path in completed:
+                    if pptx_path not in completed:
+                        # 没有符合条件图片的文件在CSV中没有记录，写回空列表即可
+                        deck_writer.writerows(previous_rows.get(pptx_path, []))
+                        append_deck_rows(csv_file, deck_rows, journal, pptx_path)
+                    continue
+            if pptx_path in completed:
+                continue
+            process_pptx(pptx_path, dest_folder, deck_writer, existing_hashes, reduced_decode, thumbnail_store,
+                         resuming)
+            append_deck_rows(csv_file, deck_rows, journal, pptx_path)
+            processed_paths.append(pptx_path)
+            logging.info(f"Processed {pptx_path}")
+
+    if manifest is not None:
+        # CSV完整写出后再更新清单，避免中途出错时清单记录了CSV中并不存在的文件
+        for pptx_path in processed_paths:
+            manifest.record(pptx_path)
+        manifest.purge_missing(src_folder, seen_paths)
+        manifest.close()
 
-        for root, dirs, files in os.walk(src_folder):
-            for file in files:
-                if file.endswith(".pptx") and not file.startswith("~$") and not file.startswith("._"):
-                    pptx_path = os.path.join(root, file)
-                    save_slide_images(pptx_path, dest_folder, csv_writer, existing_hashes)
-                    logging.info(f"Processed {pptx_path}")
+    if reduced_decode:
+        REDUCED_HASH_ENGINE.log_report()
+
+    # 本次运行已完整写出，删除上一次的结果和进度记录
+    if os.path.exists(previous_csv_path):
+        os.remove(previous_csv_path)
+    journal.finish()
 
     # 找到重复的hash，更新csv表格，并删除重复的图片文件
     mark_and_remove_duplicates_in_csv(csv_file_path)
 
 
+def append_deck_rows(csv_file, deck_rows, journal, pptx_path):
+    """把一个PPTX文件的全部记录追加到CSV，落盘后再记录进度。"""
+    csv_file.write(deck_rows.getvalue())
+    csv_file.flush()
+    os.fsync(csv_file.fileno())
+    journal.mark_done(pptx_path, csv_file.tell())
+
+
 if __name__ == "__main__":
     src_folder = "/Volumes/Backup/mac_backup"
     dest_folder = "/Users/birdmanoutman/上汽/backgroundIMGsource"
     csv_file_path = os.path.join(dest_folder, "image_ppt_mapping.csv")
-    main(src_folder, dest_folder, csv_file_path)
+    # 加上 --resume 参数运行时从上一次中断的位置继续
+    main(src_folder, dest_folder, csv_file_path, incremental=True, resume="--resume" in sys.argv)
@@ -7,28 +7,71 @@ main 函数作为程序的启动点，配置并运行 ImageProcessor。
 
 # findBackgroundIMG_sqliteV1.py
 import io
+import itertools
 import logging
 import os
 import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 import pandas as pd
 from PIL import Image
 from pptx import Presentation
 
 # Ensure utils.py is in the same directory and contains calculate_hash, is_size_similar functions.
-from modules.findBackgroundIMG.utils import calculate_hash, is_size_similar
+from modules.findBackgroundIMG.blob_store import BlobStore
+from modules.findBackgroundIMG.color_index import image_color_columns
+from modules.findBackgroundIMG.deck_index import create_deck_tables, delete_deck, occurrence_table, write_occurrences, \
+    DECK_TABLE
+from modules.findBackgroundIMG.discovery import PPTXWalker
+from modules.findBackgroundIMG.hash_index import HammingIndex
+from modules.findBackgroundIMG.hashing import HashEngine, log_throughput
+from modules.findBackgroundIMG.image_verifier import METADATA_COLUMNS, saved_image_metadata
+from modules.findBackgroundIMG.manifest import PPTXManifest, UNCHANGED, MODIFIED
+from modules.findBackgroundIMG.pipeline import ExtractionPipeline
+from modules.findBackgroundIMG.pptx_media import PPTXMediaReader
+from modules.findBackgroundIMG.run_stats import RunStats, timed
+from modules.findBackgroundIMG.thumbnails import ThumbnailStore
+from modules.findBackgroundIMG.utils import blob_digest, calculate_hash, is_size_similar
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 图库表中在最初版本之后新增、由提取流程写入的列；create_table 会为旧表补上这些列
+EXTRA_IMAGE_COLUMNS = {
+    'img_digest': 'TEXT',
+    'thumb_small': 'TEXT',
+    'thumb_medium': 'TEXT',
+    'color_hist': 'BLOB',
+    'dominant_colors': 'BLOB',
+    **METADATA_COLUMNS,
+}
+INSERT_COLUMNS = ('img_hash', 'img_path', 'pptx_path') + tuple(EXTRA_IMAGE_COLUMNS)
+
+
+def insert_image_sql(table_name):
+    # 按 img_hash 更新已有记录而不是 INSERT OR REPLACE（先删后插会改变 id，出现记录引用的 image_id 随之失效）
+    placeholders = ', '.join('?' * len(INSERT_COLUMNS))
+    updates = ', '.join(f"{column}=excluded.{column}" for column in INSERT_COLUMNS[1:])
+    return (f"INSERT INTO {table_name} ({', '.join(INSERT_COLUMNS)}) VALUES ({placeholders}) "
+            f"ON CONFLICT(img_hash) DO UPDATE SET {updates}")
+
+
+def image_row(img_hash, img_path, pptx_path, extra_columns):
+    return (img_hash, img_path, pptx_path) + tuple(extra_columns.get(column) for column in EXTRA_IMAGE_COLUMNS)
+
 
 class SQLiteManager:
     """
     功能：管理SQLite数据库的连接、创建表、导入CSV数据到数据库、检查图片哈希值是否重复、插入图片记录到数据库，以及关闭数据库连接。
+    图库表每个 img_hash 一行；图片在哪些PPTX文件中出现记录在演示文稿表和出现记录表中（多对多，见 deck_index）。
     与其他对象的关系：ImageManager 类会使用 SQLiteManager 类来查询数据库中的图片记录，判断图片是否重复，并存储新的图片记录。
+    传入 stats（RunStats）时，查重和写入的耗时记入 db 阶段。
     """
-    def __init__(self, db_path):
+    def __init__(self, db_path, stats=None):
         self.db_path = db_path
+        self.stats = stats
         self.conn = None
         self.cursor = None
 
@@ -52,50 +95,126 @@ class SQLiteManager:
             )'''
         try:
             self.cursor.execute(table_sql)
+            # 新增的列统一在这里补上，新表和旧表的结构保持一致
+            self.add_missing_columns(table_name, EXTRA_IMAGE_COLUMNS)
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_img_digest ON {table_name} (img_digest)")
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_decodable ON {table_name} (decodable)")
+            create_deck_tables(self.cursor, table_name)
             self.conn.commit()
             logging.info("Table is ready.")
         except sqlite3.Error as e:
             logging.error(f"Error creating table: {e}")
             raise e
 
-    def import_csv_to_database(self, csv_file_path, table_name):
+    def add_missing_columns(self, table_name, columns):
+        """columns 为 {列名: 类型}，表中不存在的列用 ALTER TABLE 添加。"""
+        self.cursor.execute(f"PRAGMA table_info({table_name})")
+        existing = {row[1] for row in self.cursor.fetchall()}
+        for column, column_type in columns.items():
+            if column not in existing:
+                self.cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type}")
+                logging.info(f"Added column {column} to {table_name}.")
+
+    def import_csv_to_database(self, csv_file_path, table_name, chunk_size=50000, progress_callback=None):
+        """分块流式导入CSV：每次读取 chunk_size 行，用 executemany 在一个事务中写入，内存占用与文件大小无关。
+        同一图片在CSV中的每一行都记为一次出现，不会因为后面的行覆盖 pptx_path 而丢失之前的文件。
+
+        progress_callback(percent) 在每个分块写入后按已读取的字节比例报告进度（0-100）。
+        """
+        sql = (f'INSERT INTO {table_name} (img_hash, img_path, pptx_path, is_duplicate) VALUES (?, ?, ?, ?) '
+               f'ON CONFLICT(img_hash) DO UPDATE SET img_path=excluded.img_path, pptx_path=excluded.pptx_path')
+        columns = ['Image Hash', 'Image File', 'PPTX File', 'Is Duplicate']
+        total_bytes = os.path.getsize(csv_file_path) or 1
+        imported = 0
         try:
-            df = pd.read_csv(csv_file_path)
-            for _, row in df.iterrows():
-                img_hash = row['Image Hash']
-                img_path = row['Image File']
-                pptx_path = row['PPTX File']
-                is_duplicate = row['Is Duplicate']
-                self.cursor.execute(
-                    f'INSERT INTO {table_name} (img_hash, img_path, pptx_path, is_duplicate) VALUES (?, ?, ?,?'
-                    f') ON CONFLICT('
-                    f'img_hash) DO UPDATE SET img_path=excluded.img_path, pptx_path=excluded.pptx_path',
-                    (img_hash, img_path, pptx_path, is_duplicate))
-
-            self.conn.commit()
-            logging.info("CSV import completed.")
+            with open(csv_file_path, 'rb') as csv_file:
+                for chunk in pd.read_csv(csv_file, usecols=columns, chunksize=chunk_size):
+                    chunk = chunk[columns]
+                    rows = [(img_hash, img_path, pptx_path, int(is_duplicate))
+                            for img_hash, img_path, pptx_path, is_duplicate in chunk.itertuples(index=False, name=None)]
+                    self.cursor.executemany(sql, rows)
+                    write_occurrences(self.cursor, table_name,
+                                      [(pptx_path, os.path.basename(img_path), img_hash, None)
+                                       for img_hash, img_path, pptx_path, _ in rows])
+                    self.conn.commit()
+                    imported += len(rows)
+                    if progress_callback:
+                        progress_callback(min(99, csv_file.tell() * 100 // total_bytes))
+            if progress_callback:
+                progress_callback(100)
+            logging.info(f"CSV import completed: {imported} rows.")
         except Exception as e:
             logging.error(f"Error importing CSV to database: {e}")
             raise e
 
     def check_duplicate(self, table_name, img_hash):
         try:
-            self.cursor.execute(f"SELECT EXISTS(SELECT 1 FROM {table_name} WHERE img_hash=? LIMIT 1)", (img_hash,))
-            return self.cursor.fetchone()[0]
+            with timed(self.stats, 'db'):
+                self.cursor.execute(f"SELECT EXISTS(SELECT 1 FROM {table_name} WHERE img_hash=? LIMIT 1)", (img_hash,))
+                return self.cursor.fetchone()[0]
         except sqlite3.Error as e:
             logging.error(f"Error checking duplicate: {e}")
             raise e
 
-    def insert_image(self, table_name, img_hash, img_path, pptx_path):
+    def insert_image(self, table_name, img_hash, img_path, pptx_path, **extra_columns):
+        """extra_columns 为 EXTRA_IMAGE_COLUMNS 中的列，如 img_digest、thumb_small，未提供的列写入 NULL。"""
         try:
-            self.cursor.execute(
-                f"INSERT INTO {table_name} (img_hash, img_path, pptx_path) VALUES (?, ?, ?) ON CONFLICT(img_hash) DO REPLACE",
-                (img_hash, img_path, pptx_path))
-            self.conn.commit()
+            with timed(self.stats, 'db'):
+                self.cursor.execute(insert_image_sql(table_name), image_row(img_hash, img_path, pptx_path, extra_columns))
+                self.conn.commit()
         except sqlite3.Error as e:
             logging.error(f"Error inserting image: {e}")
             raise e
 
+    def insert_occurrence(self, table_name, pptx_path, img_name, img_hash=None, img_digest=None):
+        """记录图片在 pptx_path 中出现一次。图片按 img_hash 查找，img_hash 为空时按 img_digest 查找，图片记录需已写入。"""
+        try:
+            with timed(self.stats, 'db'):
+                write_occurrences(self.cursor, table_name, [(pptx_path, img_name, img_hash, img_digest)])
+                self.conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error inserting occurrence: {e}")
+            raise e
+
+    def fetch_image_hashes(self, table_name, pptx_path=None):
+        """返回 [(img_hash, img_path), ...]，指定 pptx_path 时只返回在该文件中出现的图片。"""
+        try:
+            if pptx_path is None:
+                self.cursor.execute(f"SELECT img_hash, img_path FROM {table_name}")
+            else:
+                self.cursor.execute(f"SELECT DISTINCT i.img_hash, i.img_path FROM {DECK_TABLE} d "
+                                    f"JOIN {occurrence_table(table_name)} o ON o.deck_id=d.id "
+                                    f"JOIN {table_name} i ON i.id=o.image_id WHERE d.pptx_path=?", (pptx_path,))
+            return self.cursor.fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Error fetching image hashes: {e}")
+            raise e
+
+    def fetch_image_digests(self, table_name, pptx_path=None):
+        """返回图片原始字节摘要的集合，指定 pptx_path 时只返回在该文件中出现的图片。"""
+        try:
+            if pptx_path is None:
+                self.cursor.execute(f"SELECT img_digest FROM {table_name} WHERE img_digest IS NOT NULL")
+            else:
+                self.cursor.execute(f"SELECT i.img_digest FROM {DECK_TABLE} d "
+                                    f"JOIN {occurrence_table(table_name)} o ON o.deck_id=d.id "
+                                    f"JOIN {table_name} i ON i.id=o.image_id "
+                                    f"WHERE d.pptx_path=? AND i.img_digest IS NOT NULL", (pptx_path,))
+            return {row[0] for row in self.cursor.fetchall()}
+        except sqlite3.Error as e:
+            logging.error(f"Error fetching image digests: {e}")
+            raise e
+
+    def delete_images_by_pptx(self, table_name, pptx_path):
+        """删除该文件的出现记录，以及不再被任何文件使用的图片记录，返回被删除图片的 [(img_hash, img_digest), ...]。"""
+        try:
+            removed = delete_deck(self.cursor, table_name, pptx_path)
+            self.conn.commit()
+            return removed
+        except sqlite3.Error as e:
+            logging.error(f"Error deleting images of {pptx_path}: {e}")
+            raise e
+
     def close(self):
         if self.cursor:
             self.cursor.close()
@@ -104,67 +223,424 @@ class SQLiteManager:
         logging.info("Database connection closed.")
 
 
+class BatchedSQLiteManager(SQLiteManager):
+    """
+    功能：SQLiteManager 的批量写入版本。连接使用WAL日志模式；insert_image 和 insert_occurrence 只把记录放入缓冲区，
+    每满 batch_size 条用 executemany 在一个事务中写入（先写图片，再写引用图片的出现记录）；check_duplicate 使用一次性预加载到内存的哈希集合，不再逐条查询。
+    close 时写入剩余记录，冲突处理与 SQLiteManager.insert_image 相同（按 img_hash 替换）。
+    与其他对象的关系：接口与 SQLiteManager 相同，ImageManager 和 ImageProcessor 可以直接替换使用。
+    """
+
+    def __init__(self, db_path, batch_size=1000, stats=None):
+        super().__init__(db_path, stats)
+        self.batch_size = max(1, int(batch_size))
+        self.known_hashes = {}  # table_name -> 已入库或待写入的 img_hash 集合
+        self.pending = {}  # table_name -> 待写入的行列表，列顺序见 INSERT_COLUMNS
+        self.pending_occurrences = {}  # table_name -> [(pptx_path, img_name, img_hash, img_digest), ...]
+
+    def connect(self):
+        super().connect()
+        try:
+            self.cursor.execute("PRAGMA journal_mode=WAL")
+            self.cursor.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error as e:
+            logging.error(f"Error enabling WAL mode: {e}")
+            raise e
+
+    def load_known_hashes(self, table_name):
+        if table_name not in self.known_hashes:
+            self.known_hashes[table_name] = {img_hash for img_hash, _ in self.fetch_image_hashes(table_name)}
+            logging.info(f"Loaded {len(self.known_hashes[table_name])} known image hashes.")
+        return self.known_hashes[table_name]
+
+    def check_duplicate(self, table_name, img_hash):
+        return img_hash in self.load_known_hashes(table_name)
+
+    def import_csv_to_database(self, csv_file_path, table_name, chunk_size=50000, progress_callback=None):
+        self.flush()
+        super().import_csv_to_database(csv_file_path, table_name, chunk_size, progress_callback)
+        # 导入的记录不在内存中的哈希集合里，下次查询时重新加载
+        self.known_hashes.pop(table_name, None)
+
+    def insert_image(self, table_name, img_hash, img_path, pptx_path, **extra_columns):
+        self.load_known_hashes(table_name).add(img_hash)
+        rows = self.pending.setdefault(table_name, [])
+        rows.append(image_row(img_hash, img_path, pptx_path, extra_columns))
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def insert_occurrence(self, table_name, pptx_path, img_name, img_hash=None, img_digest=None):
+        rows = self.pending_occurrences.setdefault(table_name, [])
+        rows.append((pptx_path, img_name, img_hash, img_digest))
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        try:
+            with timed(self.stats, 'db'):
+                for table_name, rows in self.pending.items():
+                    if rows:
+                        self.cursor.executemany(insert_image_sql(table_name), rows)
+                for table_name, rows in self.pending_occurrences.items():
+                    if rows:
+                        write_occurrences(self.cursor, table_name, rows)
+                self.conn.commit()
+            self.pending = {}
+            self.pending_occurrences = {}
+        except sqlite3.Error as e:
+            logging.error(f"Error flushing images: {e}")
+            raise e
+
+    def delete_images_by_pptx(self, table_name, pptx_path):
+        self.flush()
+        removed = super().delete_images_by_pptx(table_name, pptx_path)
+        if table_name in self.known_hashes:
+            self.known_hashes[table_name].difference_update(img_hash for img_hash, _ in removed)
+        return removed
+
+    def close(self):
+        if self.conn:
+            self.flush()
+        super().close()
+
+
 class ImageManager:
     """
     功能：负责检查图片是否为重复图片（通过图片的哈希值），保存新的图片到指定文件夹，并更新数据库中的记录。
     与其他对象的关系：依赖 SQLiteManager 类来执行数据库操作，由 ImageExtractor 类调用来处理具体的图片保存逻辑。
+    near_duplicate_distance 大于0时，与已有图片的感知哈希汉明距离不超过该值的图片也视为重复（使用 HammingIndex 查询）。
+    图片原始字节的摘要（img_digest）集合在首次使用时一次性加载，字节完全相同的图片无需解码即可判定为重复。
+    传入 thumbnail_store（ThumbnailStore）时，保存新图片的同时生成缩略图并把路径写入数据库。
+    传入 blob_store（BlobStore）时，新图片按原始字节以内容寻址方式保存，img_path 记录其规范路径；否则转为RGB后按 img_name 保存。
+    保存图片文件和缩略图的耗时记入 stats（RunStats）的 save 阶段，并统计保存和跳过的图片数。
+    color_features 为 True 时为新图片计算颜色特征（LAB 直方图和主色，见 color_index），写入 color_hist、dominant_colors 列。
+    新图片的格式、尺寸和 decodable=1 在保存时一并写入（见 image_verifier），图库界面启动时不必再解码检查。
+    无论图片是新保存的还是重复的，都记录一次它在该PPTX文件中的出现（重复图片记在已入库的那张图片上）。
     """
 
-    def __init__(self, db_manager, table_name):
+    def __init__(self, db_manager, table_name, near_duplicate_distance=0, thumbnail_store=None, blob_store=None,
+                 stats=None, color_features=False):
         self.db_manager = db_manager
         self.table_name = table_name
+        self.near_duplicate_distance = near_duplicate_distance
+        self.thumbnail_store = thumbnail_store
+        self.blob_store = blob_store
+        self.stats = stats or RunStats()
+        self.color_features = color_features
+        self.hash_index = None
+        self.digests = None
+
+    def known_digests(self):
+        if self.digests is None:
+            self.digests = self.db_manager.fetch_image_digests(self.table_name)
+        return self.digests
+
+    def is_known_digest(self, img_digest):
+        return img_digest is not None and img_digest in self.known_digests()
+
+    def get_hash_index(self):
+        if self.hash_index is None:
+            self.hash_index = HammingIndex()
+            for img_hash, img_path in self.db_manager.fetch_image_hashes(self.table_name):
+                self.hash_index.add(img_hash, img_path)
+        return self.hash_index
+
+    def find_duplicate(self, img_hash):
+        """返回与之重复的已入库图片的 img_hash，没有重复时返回 None。"""
+        if self.db_manager.check_duplicate(self.table_name, img_hash):
+            return img_hash
+        if self.near_duplicate_distance > 0:
+            matches = self.get_hash_index().query(img_hash, self.near_duplicate_distance)
+            if matches:
+                logging.info(f"Near-duplicate of {matches[0][2]} (distance {matches[0][0]}).")
+                return matches[0][1]
+        return None
 
     def is_duplicate(self, img_hash):
-        return self.db_manager.check_duplicate(self.table_name, img_hash)
+        return self.find_duplicate(img_hash) is not None
 
-    def save_image(self, img, img_hash, img_name, dest_folder, pptx_path):
-        if self.is_duplicate(img_hash):
+    def add_occurrence(self, pptx_path, img_name, img_hash=None, img_digest=None):
+        self.db_manager.insert_occurrence(self.table_name, pptx_path, img_name, img_hash, img_digest)
+
+    def save_image(self, img, img_hash, img_name, dest_folder, pptx_path, img_digest=None, blob=None):
+        stored_hash = self.find_duplicate(img_hash)
+        if stored_hash is not None:
             logging.info(f"Duplicate image detected, not saved: {img_name}")
+            self.add_occurrence(pptx_path, img_name, stored_hash)
+            self.stats.count('duplicates_skipped')
             return False
         else:
-            if img.mode in ['RGBA', 'P']:
-                img = img.convert('RGB')
-
-            img_path = os.path.join(dest_folder, img_name)
-            img.save(img_path)
-            logging.info(f"Saved image: {img_path}")
-            self.db_manager.insert_image(self.table_name, img_hash, img_path, pptx_path)
+            with self.stats.timer('save'):
+                if self.blob_store is not None and blob is not None:
+                    img_path = self.blob_store.put(blob, img, img_digest)
+                else:
+                    if img.mode in ['RGBA', 'P']:
+                        img = img.convert('RGB')
+
+                    img_path = os.path.join(dest_folder, img_name)
+                    img.save(img_path)
+                logging.info(f"Saved image: {img_path}")
+                thumbs = {}
+                if self.thumbnail_store is not None:
+                    thumbs = self.thumbnail_store.save_thumbnails(img, img_hash)
+                colors = image_color_columns(img) if self.color_features else {}
+            self.db_manager.insert_image(self.table_name, img_hash, img_path, pptx_path, img_digest=img_digest,
+                                         thumb_small=thumbs.get('small'), thumb_medium=thumbs.get('medium'), **colors,
+                                         **saved_image_metadata(img, img_path))
+            self.add_occurrence(pptx_path, img_name, img_hash)
+            if self.hash_index is not None:
+                self.hash_index.add(img_hash, img_path)
+            if img_digest is not None:
+                self.known_digests().add(img_digest)
+            self.stats.count('images_saved')
             return True
 
+    def forget_pptx(self, pptx_path):
+        """删除某个PPTX文件的出现记录和只在该文件中出现的图片记录（文件被修改或删除时调用）。"""
+        removed = self.db_manager.delete_images_by_pptx(self.table_name, pptx_path)
+        for img_hash, img_digest in removed:
+            if self.hash_index is not None:
+                self.hash_index.remove(img_hash)
+            if self.digests is not None:
+                self.digests.discard(img_digest)
+
+
+def scan_pptx(pptx_path, known_digests=frozenset(), data=None, stats=None):
+    """打开并解析单个PPTX文件，返回其中尺寸接近幻灯片的图片以及幻灯片、版式和母版的图片背景的记录列表。
+
+    每条记录为 (img_name, img_hash, blob, img_digest)。原始字节摘要在 known_digests 中的图片已经入库，
+    不再解码和计算哈希，记录为 (img_name, None, None, img_digest)。该函数不访问数据库，因此既可在主进程中串行调用，
+    也可以在工作进程中并行执行。data 为已经读入内存的文件内容时不再读取 pptx_path。
+    传入 stats（RunStats）时记录读取的字节数、每张图片的解码耗时和解码的字节数（hashed_bytes）。
+    背景图片的 img_name 为 <文件名>_<幻灯片序号>_bg.jpg 或 <文件名>_<版式/母版部件名>_bg.jpg，见 PPTXMediaReader.iter_backgrounds。
+    """
+    if stats is not None:
+        stats.count('bytes_read', len(data) if data is not None else os.path.getsize(pptx_path))
+    records = []
+    pptx_name = os.path.splitext(os.path.basename(pptx_path))[0]
+
+    def add_record(img_name, blob):
+        img_digest = blob_digest(blob)
+        if img_digest in known_digests:
+            records.append((img_name, None, None, img_digest))
+            return
+        with timed(stats, 'decode'):
+            img_hash = calculate_hash(blob)
+        if stats is not None:
+            stats.count('hashed_bytes', len(blob))
+        if img_hash:
+            records.append((img_name, img_hash, blob, img_digest))
+
+    presentation = Presentation(io.BytesIO(data) if data is not None else pptx_path)
+    slide_width = presentation.slide_width
+    slide_height = presentation.slide_height
+    for slide_idx, slide in enumerate(presentation.slides):
+        for shape_idx, shape in enumerate(slide.shapes):
+            if shape.shape_type == 13:  # Picture type
+                if is_size_similar(shape.width, shape.height, slide_width, slide_height):
+                    add_record(f"{pptx_name}_{slide_idx + 1}_{shape_idx + 1}.jpg", shape.image.blob)
+
+    # python-pptx 不提供背景填充的图片数据，背景直接从压缩包中读取
+    with PPTXMediaReader(io.BytesIO(data) if data is not None else pptx_path) as reader:
+        for label, media_part in reader.iter_backgrounds():
+            add_record(f"{pptx_name}_{label}.jpg", reader.read_media(media_part))
+    return records
+
+
+def scan_pptx_zip(pptx_path, reduced_decode=False, known_digests=frozenset(), data=None, stats=None):
+    """scan_pptx 的快速版本：直接读取压缩包中的幻灯片XML和 ppt/media/* 部件。
+
+    同一个媒体部件在一个演示文稿中只读取、解码和计算哈希一次（由 HashEngine 对整个演示文稿的候选图片批量计算），
+    但每个 (幻灯片, 形状) 出现位置和每个图片背景仍然生成一条记录，返回结果与 scan_pptx 相同。
+    reduced_decode 为 True 时以较低分辨率解码计算哈希，速度更快，但哈希可能与 scan_pptx 的结果有个别位不同。
+    """
+    if stats is not None:
+        stats.count('bytes_read', len(data) if data is not None else os.path.getsize(pptx_path))
+    occurrences = []
+    media_blobs = {}  # media_part_name -> blob
+    media_digests = {}  # media_part_name -> img_digest
+    pptx_name = os.path.splitext(os.path.basename(pptx_path))[0]
+    with PPTXMediaReader(io.BytesIO(data) if data is not None else pptx_path) as reader:
+        # 候选筛选只看XML中的形状尺寸和幻灯片尺寸，图标等小图片不会被读取
+        pictures = ((f"{pptx_name}_{slide_idx + 1}_{shape_idx + 1}.jpg", media_part)
+                    for slide_idx, shape_idx, media_part, _, _ in reader.iter_pictures(is_size_similar))
+        backgrounds = ((f"{pptx_name}_{label}.jpg", media_part) for label, media_part in reader.iter_backgrounds())
+        for img_name, media_part in itertools.chain(pictures, backgrounds):
+            if media_part not in media_digests:
+                blob = reader.read_media(media_part)
+                media_digests[media_part] = blob_digest(blob)
+                if media_digests[media_part] not in known_digests:
+                    media_blobs[media_part] = blob
+            occurrences.append((img_name, media_part))
+
+    hash_engine = HashEngine(reduced=reduced_decode, stats=stats)
+    media_hashes = dict(zip(media_blobs, hash_engine.hash_blobs(list(media_blobs.values()))))
+    records = []
+    for img_name, media_part in occurrences:
+        if media_part not in media_blobs:
+            records.append((img_name, None, None, media_digests[media_part]))
+            continue
+        hashes = media_hashes[media_part]
+        if hashes:
+            records.append((img_name, hashes['ahash'], media_blobs[media_part], media_digests[media_part]))
+    return records
+
+
+# 工作进程中已入库图片的摘要快照，由进程池的 initializer 在每个工作进程启动时设置一次
+worker_known_digests = frozenset()
+
+
+def init_scan_worker(known_digests):
+    global worker_known_digests
+    worker_known_digests = known_digests
+
+
+def scan_in_worker(scan, pptx_path, data=None):
+    """返回 (records, stats)，stats 为该文件在工作进程中的计时和计数，由主进程合并。"""
+    stats = RunStats()
+    with stats.timer('scan'):
+        records = scan(pptx_path, known_digests=worker_known_digests, data=data, stats=stats)
+    return records, stats
+
 
 class ImageExtractor:
     """
     功能：遍历指定源文件夹中的所有PPTX文件，提取每个演示文稿中的图片，并处理每张图片。
     与其他对象的关系：使用 ImageManager 类来处理图片的保存和数据库记录更新。它是图片提取过程的起点，负责具体的图片提取逻辑。
+    并行模式：workers 大于1时，由进程池中的工作进程执行 scan_pptx_zip / scan_pptx（打开、解码并计算哈希），
+    主进程作为唯一的写入者按文件遍历顺序消费结果，独占 SQLiteManager 连接并负责去重和入库，因此结果与串行模式一致。
+    fast_path 为 True（默认）时使用 scan_pptx_zip 直接读取压缩包，为 False 时使用基于 python-pptx 的 scan_pptx；
+    reduced_decode 只对 fast_path 生效，见 scan_pptx_zip。
+    增量模式：传入 manifest（PPTXManifest）时，未变化的文件被跳过，修改过的文件先清除旧记录再重新处理，
+    已删除文件的记录在遍历结束后清除。
+    流水线模式：pipeline 为 True 时使用 ExtractionPipeline，readers 个线程预读文件、workers 个进程解码，
+    当前线程作为唯一的写入者。数据库连接只在当前线程中使用，因此增量模式下先完成遍历和清单比较，再启动流水线。
+    源文件由 walker（PPTXWalker，默认按 os.walk 的顺序串行遍历并使用默认排除规则）查找，找到一个处理一个。
     """
 
-    def __init__(self, src_folder, dest_folder, image_manager):
+    def __init__(self, src_folder, dest_folder, image_manager, workers=1, manifest=None, fast_path=True,
+                 reduced_decode=False, pipeline=False, readers=4, walker=None, stats=None):
         self.src_folder = src_folder
         self.dest_folder = dest_folder
         self.image_manager = image_manager
+        self.workers = max(1, int(workers or 1))
+        self.manifest = manifest
+        self.pipeline = pipeline
+        self.readers = readers
+        self.walker = walker or PPTXWalker(src_folder)
+        self.stats = stats or image_manager.stats
+        self.scan = partial(scan_pptx_zip, reduced_decode=reduced_decode) if fast_path else scan_pptx
+
+    def find_pptx_files(self):
+        return iter(self.walker)
+
+    def find_changed_pptx_files(self):
+        """在 find_pptx_files 的基础上根据清单过滤掉未变化的文件，遍历结束后清除已删除文件的记录。"""
+        if self.manifest is None:
+            yield from self.find_pptx_files()
+            return
+
+        seen_paths = set()
+        skipped = 0
+        for pptx_path, stat in self.walker.walk():
+            seen_paths.add(pptx_path)
+            status = self.manifest.check(pptx_path, stat)
+            if status == UNCHANGED:
+                skipped += 1
+                continue
+            if status == MODIFIED:
+                self.image_manager.forget_pptx(pptx_path)
+            yield pptx_path
+
+        for pptx_path in self.manifest.purge_missing(self.src_folder, seen_paths):
+            self.image_manager.forget_pptx(pptx_path)
+        logging.info(f"Skipped {skipped} unchanged PPTX files.")
 
     def extract_images(self):
-        for root, _, files in os.walk(self.src_folder):
-            for file in files:
-                if file.endswith(".pptx") and not file.startswith("~$"):
-                    pptx_path = os.path.join(root, file)
-                    self.process_pptx(pptx_path)
+        if self.pipeline:
+            self.extract_images_pipeline()
+        elif self.workers > 1:
+            self.extract_images_parallel()
+        else:
+            for pptx_path in self.find_changed_pptx_files():
+                self.process_pptx(pptx_path)
+
+    def extract_images_parallel(self):
+        # 最多同时提交 workers * 2 个任务，既让工作进程保持忙碌，又避免把整个目录的图片数据堆在内存里
+        max_pending = self.workers * 2
+        pending = deque()
+        # 增量模式下先走完清单（会删除被修改和被删除文件的图片记录），再取摘要快照交给工作进程，
+        # 否则工作进程会跳过刚被删除的图片的解码
+        paths = self.find_changed_pptx_files()
+        if self.manifest is not None:
+            paths = list(paths)
+        # 工作进程只拿到启动时已入库的摘要；本次运行中新入库的字节相同图片仍会被解码，由写入端按哈希去重，结果不变
+        known_digests = frozenset(self.image_manager.known_digests())
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_scan_worker,
+                                 initargs=(known_digests,)) as executor:
+            for pptx_path in paths:
+                pending.append((pptx_path, executor.submit(scan_in_worker, self.scan, pptx_path)))
+                if len(pending) >= max_pending:
+                    self._save_next_result(pending)
+            while pending:
+                self._save_next_result(pending)
+
+    def extract_images_pipeline(self):
+        paths = self.find_changed_pptx_files()
+        if self.manifest is not None:
+            paths = list(paths)
+        known_digests = frozenset(self.image_manager.known_digests())
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_scan_worker,
+                                 initargs=(known_digests,)) as executor:
+            pipeline = ExtractionPipeline(partial(executor.submit, scan_in_worker, self.scan), self.save_scan_result,
+                                          readers=self.readers, window=self.workers * 4)
+            pipeline.run(paths)
+
+    def _save_next_result(self, pending):
+        pptx_path, future = pending.popleft()
+        try:
+            result = future.result()
+        except Exception as e:
+            logging.error(f"Error processing PPTX: {e}")
+            for _, remaining in pending:
+                remaining.cancel()
+            raise e
+        self.save_scan_result(pptx_path, result)
 
     def process_pptx(self, pptx_path):
         try:
-            presentation = Presentation(pptx_path)
-            for slide_idx, slide in enumerate(presentation.slides):
-                for shape_idx, shape in enumerate(slide.shapes):
-                    if shape.shape_type == 13:  # Picture type
-                        img = Image.open(io.BytesIO(shape.image.blob))
-                        if is_size_similar(img, presentation):
-                            img_hash = calculate_hash(shape.image.blob)
-                            if img_hash:
-                                img_name = f"{os.path.splitext(os.path.basename(pptx_path))[0]}_{slide_idx + 1}_{shape_idx + 1}.jpg"
-                                self.image_manager.save_image(img, img_hash, img_name, self.dest_folder, pptx_path)
+            with self.stats.timer('scan'):
+                records = self.scan(pptx_path, known_digests=self.image_manager.known_digests(), stats=self.stats)
         except Exception as e:
             logging.error(f"Error processing PPTX: {e}")
             raise e
+        self.save_records(pptx_path, records)
+
+    def save_scan_result(self, pptx_path, result):
+        """保存 scan_in_worker 的结果，合并工作进程中的统计。"""
+        records, stats = result
+        self.stats.merge(stats)
+        self.save_records(pptx_path, records)
+
+    def save_records(self, pptx_path, records):
+        if any(blob is None and not self.image_manager.is_known_digest(img_digest)
+               for _, _, blob, img_digest in records):
+            # 扫描时已入库、之后又被删除的图片只有摘要没有数据，按当前已入库的摘要在主进程中重新扫描该文件
+            logging.info(f"Images skipped during scan are no longer stored, rescanning: {pptx_path}")
+            with self.stats.timer('scan'):
+                records = self.scan(pptx_path, known_digests=self.image_manager.known_digests(), stats=self.stats)
+        self.stats.count('files')
+        self.stats.count('images', len(records))
+        for img_name, img_hash, blob, img_digest in records:
+            if self.image_manager.is_known_digest(img_digest):
+                logging.info(f"Byte-identical image already stored, not saved: {img_name}")
+                self.image_manager.add_occurrence(pptx_path, img_name, img_digest=img_digest)
+                self.stats.count('duplicates_skipped')
+                continue
+            img = Image.open(io.BytesIO(blob))
+            self.image_manager.save_image(img, img_hash, img_name, self.dest_folder, pptx_path, img_digest, blob)
+        if self.manifest is not None:
+            self.manifest.record(pptx_path)
 
 
 class ImageProcessor:
@@ -173,30 +649,74 @@ class ImageProcessor:
     与其他对象的关系：它实例化了 SQLiteManager, ImageManager, 和 ImageExtractor 类，并通过它们协同工作完成整个图片处理流程。
     """
 
-    def __init__(self, db_path, src_folder, dest_folder, csv_file_path, table_name):
+    def __init__(self, db_path, src_folder, dest_folder, csv_file_path, table_name, workers=1, incremental=False,
+                 use_digest=False, batch_size=1000, near_duplicate_distance=0, reduced_decode=False, thumbnails=True,
+                 thumbnail_folder=None, content_store=False, pipeline=False, readers=4, walk_workers=1,
+                 exclude_patterns=None, report_path=None, prometheus_path=None, color_features=True):
         self.db_path = db_path
         self.src_folder = src_folder
         self.dest_folder = dest_folder
         self.csv_file_path = csv_file_path
         self.table_name = table_name
+        self.workers = workers  # 解析PPTX的工作进程数，1 表示串行
+        self.incremental = incremental  # 是否根据 pptx_manifest 表跳过未变化的文件
+        self.use_digest = use_digest  # 大小或修改时间变化时，是否再比较内容摘要
+        self.batch_size = batch_size  # 每个事务写入的图片记录数，1 表示每条记录单独提交
+        self.near_duplicate_distance = near_duplicate_distance  # 近似重复的汉明距离阈值，0 表示只去除完全相同的哈希
+        self.reduced_decode = reduced_decode  # 是否以较低分辨率解码计算哈希（更快，但与已有哈希可能不完全一致）
+        self.thumbnails = thumbnails  # 是否在提取时生成缩略图
+        self.thumbnail_folder = thumbnail_folder or os.path.join(dest_folder, "thumbnails")
+        self.content_store = content_store  # 是否按原始字节以内容寻址方式把图片分片保存在 dest_folder 下
+        self.pipeline = pipeline  # 是否使用 读取 -> 解码 -> 写入 三阶段流水线
+        self.readers = readers  # 流水线模式下预读PPTX文件的线程数
+        self.walk_workers = walk_workers  # 并行遍历源目录的线程数，1 表示按 os.walk 的顺序串行遍历
+        self.exclude_patterns = exclude_patterns  # 跳过的文件/目录 glob 规则，None 表示使用 DEFAULT_EXCLUDE
+        self.report_path = report_path  # 运行结束时把统计汇总写成JSON的路径
+        self.prometheus_path = prometheus_path  # 运行结束时把统计汇总写成 Prometheus textfile 的路径（.prom）
+        self.color_features = color_features  # 是否为新图片计算颜色特征，供 ColorIndex 查找相似背景
 
     def run(self):
-        db_manager = SQLiteManager(self.db_path)
+        """执行提取，返回本次运行的统计汇总（见 RunStats.report）。"""
+        stats = RunStats()
+        if self.batch_size > 1:
+            db_manager = BatchedSQLiteManager(self.db_path, self.batch_size, stats)
+        else:
+            db_manager = SQLiteManager(self.db_path, stats)
         db_manager.connect()
         db_manager.create_table(self.table_name)
 
         if self.csv_file_path:
             db_manager.import_csv_to_database(self.csv_file_path, self.table_name)
 
-        image_manager = ImageManager(db_manager, self.table_name)
+        thumbnail_store = ThumbnailStore(self.thumbnail_folder) if self.thumbnails else None
+        blob_store = BlobStore(self.dest_folder) if self.content_store else None
+        image_manager = ImageManager(db_manager, self.table_name, self.near_duplicate_distance, thumbnail_store,
+                                     blob_store, stats, self.color_features)
 
         if not os.path.exists(self.dest_folder):
             os.makedirs(self.dest_folder)
 
-        extractor = ImageExtractor(self.src_folder, self.dest_folder, image_manager)
+        manifest = None
+        if self.incremental:
+            # 批量写入时清单记录随图片记录在同一个事务中提交，避免清单记录了尚未写入的图片
+            manifest = PPTXManifest(db_manager.conn, use_digest=self.use_digest,
+                                    autocommit=not isinstance(db_manager, BatchedSQLiteManager))
+            manifest.create_table()
+
+        walker = PPTXWalker(self.src_folder, exclude=self.exclude_patterns, workers=self.walk_workers)
+        extractor = ImageExtractor(self.src_folder, self.dest_folder, image_manager, workers=self.workers,
+                                   manifest=manifest, reduced_decode=self.reduced_decode, pipeline=self.pipeline,
+                                   readers=self.readers, walker=walker)
         extractor.extract_images()
 
         db_manager.close()
+        stats.finish()
+        log_throughput(stats.hash_throughput())
+        if self.report_path:
+            stats.write_json(self.report_path)
+        if self.prometheus_path:
+            stats.write_prometheus(self.prometheus_path)
+        return stats.log_report()
 
 
 def main():
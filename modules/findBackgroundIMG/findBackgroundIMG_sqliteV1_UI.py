@@ -25,13 +25,14 @@ class Worker(QThread):
         db_manager = SQLiteManager(self.db_path)
         db_manager.connect()
         db_manager.create_table(self.table_name)
-        db_manager.import_csv_to_database(self.csv_file_path, self.table_name)
+        db_manager.import_csv_to_database(self.csv_file_path, self.table_name, progress_callback=self.progress.emit)
         db_manager.close()
-        self.progress.emit(100)  # Assuming CSV import is a single step for simplicity
 
     def process_pptx_files(self):
         db_manager = SQLiteManager(self.db_path)
         db_manager.connect()
+        # 补齐旧数据库缺少的列、出现记录表和索引，与 ImageProcessor.run 相同
+        db_manager.create_table(self.table_name)
         image_manager = ImageManager(db_manager, self.table_name)
         extractor = ImageExtractor(self.src_folder, self.dest_folder, image_manager)
         extractor.extract_images()
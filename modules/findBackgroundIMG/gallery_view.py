@@ -0,0 +1,411 @@
+# gallery_view.py
+import itertools
+import logging
+import os
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QEvent, QModelIndex, QObject, QPoint, QRect, QRunnable, QSize, \
+    QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+from PyQt5.QtWidgets import QApplication, QLabel, QListView, QMenu, QMessageBox, QStyle, QStyledItemDelegate, \
+    QStyleOptionButton
+
+from modules.findBackgroundIMG.pixmap_cache import CacheCounters, DiskThumbnailCache, PixmapLRU, \
+    DEFAULT_MEMORY_BUDGET, format_cache_stats
+from modules.findBackgroundIMG.utils import open_pptx
+
+THUMB_SIZE = 200  # 缩略图区域的边长
+TILE_WIDTH = 250  # 每个图片格子的宽度（含内边距）
+TILE_PADDING = 8
+DECK_ROW_HEIGHT = 24  # 每个PPTX按钮的高度
+MAX_DECK_ROWS = 3  # 格子中最多显示的PPTX按钮数，更多的文件放进最后一个按钮的菜单里
+VISIBLE_PRIORITY = 1  # 可见格子的缩略图先解码
+PREFETCH_PRIORITY = 0
+
+ImgPathRole = Qt.UserRole + 1
+ImgHashRole = Qt.UserRole + 2
+PptxPathsRole = Qt.UserRole + 3
+ThumbPathRole = Qt.UserRole + 4
+
+
+class ImageListModel(QAbstractListModel):
+    """
+    功能：图库中图片列表的数据模型，每项为 {'img_hash', 'img_path', 'pptx_paths'}，可选 'thumb_path'（提取时生成的缩略图）。只保存数据，不创建任何控件，
+    视图只会为可见的格子向模型取数据，因此图片数量不影响窗口的创建和重排耗时。
+    与其他对象的关系：GalleryView 使用它；ImageGalleryApp 从CSV或数据库加载图片列表后交给它。
+    """
+
+    def __init__(self, images=(), parent=None):
+        super().__init__(parent)
+        self.images = list(images)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.images)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        image_data = self.images[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(image_data['img_path'])
+        if role == Qt.ToolTipRole:
+            return '\n'.join([image_data['img_path']] + list(image_data['pptx_paths']))
+        if role == ImgPathRole:
+            return image_data['img_path']
+        if role == ImgHashRole:
+            return image_data.get('img_hash')
+        if role == PptxPathsRole:
+            return image_data['pptx_paths']
+        if role == ThumbPathRole:
+            return image_data.get('thumb_path') or None
+        return None
+
+    def set_images(self, images):
+        self.beginResetModel()
+        self.images = list(images)
+        self.endResetModel()
+
+    def remove_image(self, img_hash):
+        for row, image_data in enumerate(self.images):
+            if image_data.get('img_hash') == img_hash:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.images[row]
+                self.endRemoveRows()
+                return image_data
+        return None
+
+
+def read_scaled_image(img_path, size):
+    """用 QImageReader 直接按缩略图尺寸解码（JPEG 在解码时即缩小，不生成原尺寸图片），失败时返回空 QImage。"""
+    reader = QImageReader(img_path)
+    reader.setAutoTransform(True)
+    original_size = reader.size()
+    if original_size.isValid():
+        reader.setScaledSize(original_size.scaled(size, size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        print(f"Unable to load the image at path: {img_path} ({reader.errorString()})")
+    return image
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, loader, img_path, size, thumb_path=None):
+        super().__init__()
+        self.setAutoDelete(False)  # 由 AsyncThumbnailLoader.pending 持有，取消时还要用它调用 tryTake
+        self.loader = loader
+        self.img_path = img_path
+        self.size = size
+        self.thumb_path = thumb_path
+
+    def run(self):
+        # 提取时已生成的缩略图本身就是小图，直接读取，不再经过磁盘缓存；缩略图缺失或损坏时才使用原图
+        if self.thumb_path and os.path.exists(self.thumb_path):
+            image = read_scaled_image(self.thumb_path, self.size)
+            if not image.isNull():
+                self.loader.counters.add('thumbnail_files')
+                self.loader.loaded.emit(self.img_path, image)
+                return
+        disk_cache = self.loader.disk_cache
+        image = disk_cache.load(self.img_path, self.size) if disk_cache is not None else None
+        if image is None:
+            image = read_scaled_image(self.img_path, self.size)
+            self.loader.counters.add('decoded')
+            if disk_cache is not None:
+                disk_cache.save(self.img_path, self.size, image)
+        self.loader.loaded.emit(self.img_path, image)
+
+
+class AsyncThumbnailLoader(QObject):
+    """
+    功能：在后台线程池（最多 max_threads 个线程）中按缩略图尺寸解码图片，GUI线程不再加载原图。
+    图片有提取时生成的缩略图（thumb_path）时加载缩略图，否则解码原图。缓存和信号都以原图路径 img_path 为键。
+    pixmap 立即返回：已加载的返回缩略图，正在加载的返回空 QPixmap 并提交任务，无法加载的返回 None；
+    解码完成后通过 thumbnailReady(img_path) 信号通知视图重绘。可见格子的任务优先级高于预读任务，
+    prioritize 取消队列中已不需要（滚出屏幕）的任务。
+    两级缓存：内存中是总字节数不超过 memory_budget 的 LRU（PixmapLRU），工作线程中先查磁盘缓存（DiskThumbnailCache，
+    disk_cache_root 为 None 时使用系统缓存目录，disk_cache=False 时不使用），都未命中才解码原图并写入磁盘缓存。
+    命中/未命中计数见 stats()。
+    与其他对象的关系：GalleryView 创建它并交给 ImageTileDelegate；视图滚动停止后调用 prioritize 和 prefetch。
+    """
+
+    thumbnailReady = pyqtSignal(str)
+    loaded = pyqtSignal(str, QImage)  # 工作线程 -> GUI线程（跨线程自动排队）
+
+    def __init__(self, size=THUMB_SIZE, max_threads=4, memory_budget=DEFAULT_MEMORY_BUDGET, disk_cache=True,
+                 disk_cache_root=None, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.counters = CacheCounters()
+        self.memory = PixmapLRU(memory_budget, self.counters)
+        self.disk_cache = DiskThumbnailCache(disk_cache_root, self.counters) if disk_cache else None
+        self.failed = set()  # 无法加载的图片路径
+        self.pending = {}  # img_path -> 已提交（排队或正在解码）的 ThumbnailTask
+        self.loaded.connect(self.on_loaded)
+        if QApplication.instance() is not None:
+            QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+    def pixmap(self, img_path, thumb_path=None):
+        if img_path in self.failed:
+            return None
+        if img_path in self.pending:
+            return QPixmap()
+        pixmap = self.memory.get(img_path)
+        if pixmap is not None:
+            return pixmap
+        self.request(img_path, VISIBLE_PRIORITY, thumb_path)
+        return QPixmap()
+
+    def request(self, img_path, priority=PREFETCH_PRIORITY, thumb_path=None):
+        if img_path in self.memory or img_path in self.pending or img_path in self.failed:
+            return
+        task = ThumbnailTask(self, img_path, self.size, thumb_path)
+        self.pending[img_path] = task
+        self.pool.start(task, priority)
+
+    def prioritize(self, wanted_paths):
+        """取消排队中、且不在 wanted_paths 里的任务；已经开始解码的任务照常完成。"""
+        for img_path, task in list(self.pending.items()):
+            if img_path not in wanted_paths and self.pool.tryTake(task):
+                del self.pending[img_path]
+
+    def on_loaded(self, img_path, image):
+        self.pending.pop(img_path, None)
+        if image.isNull():
+            self.failed.add(img_path)
+        else:
+            self.memory.put(img_path, QPixmap.fromImage(image))
+        self.thumbnailReady.emit(img_path)
+
+    def stats(self):
+        return self.counters.snapshot()
+
+    def stats_text(self):
+        return format_cache_stats(self.stats(), self.memory)
+
+    def shutdown(self):
+        self.pool.clear()
+        self.pool.waitForDone()
+        self.pending.clear()
+
+
+class ImageTileDelegate(QStyledItemDelegate):
+    """
+    功能：绘制一个图片格子：上方是缩略图，下方是打开所在PPTX文件的按钮（按钮只是画出来的，点击由 editorEvent 处理），
+    每个格子不再对应 QWidget、QLabel 和 QPushButton。所有格子大小相同，视图可以直接按行列计算位置。
+    与其他对象的关系：GalleryView 使用它，缩略图来自 thumbnail_provider（见 AsyncThumbnailLoader），正在加载时画一个空框。
+    """
+
+    def __init__(self, thumbnail_provider, parent=None):
+        super().__init__(parent)
+        self.thumbnail_provider = thumbnail_provider
+
+    def sizeHint(self, option, index):
+        return QSize(TILE_WIDTH, TILE_PADDING * 3 + THUMB_SIZE + MAX_DECK_ROWS * (DECK_ROW_HEIGHT + 2))
+
+    def thumb_rect(self, tile_rect):
+        return QRect(tile_rect.left() + (tile_rect.width() - THUMB_SIZE) // 2, tile_rect.top() + TILE_PADDING,
+                     THUMB_SIZE, THUMB_SIZE)
+
+    def deck_rects(self, tile_rect, count):
+        """返回 count 个（最多 MAX_DECK_ROWS 个）PPTX按钮的位置。"""
+        thumb = self.thumb_rect(tile_rect)
+        top = thumb.bottom() + TILE_PADDING
+        return [QRect(thumb.left(), top + row * (DECK_ROW_HEIGHT + 2), THUMB_SIZE, DECK_ROW_HEIGHT)
+                for row in range(min(count, MAX_DECK_ROWS))]
+
+    @staticmethod
+    def deck_labels(pptx_paths):
+        """按钮文字；文件数超过 MAX_DECK_ROWS 时最后一个按钮显示剩余的数量。"""
+        if len(pptx_paths) <= MAX_DECK_ROWS:
+            return [os.path.basename(path) for path in pptx_paths]
+        shown = [os.path.basename(path) for path in pptx_paths[:MAX_DECK_ROWS - 1]]
+        return shown + [f"其他 {len(pptx_paths) - len(shown)} 个文件…"]
+
+    def paint(self, painter, option, index):
+        painter.save()
+        style = option.widget.style() if option.widget else QApplication.style()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        elif option.state & QStyle.State_MouseOver:
+            painter.fillRect(option.rect, option.palette.alternateBase())
+
+        thumb = self.thumb_rect(option.rect)
+        pixmap = self.thumbnail_provider.pixmap(index.data(ImgPathRole), index.data(ThumbPathRole))
+        if pixmap is not None and not pixmap.isNull():
+            # 保持比例缩放后的缩略图在格子中居中
+            target = QRect(QPoint(0, 0), pixmap.size())
+            target.moveCenter(thumb.center())
+            painter.drawPixmap(target, pixmap)
+        else:
+            painter.drawRect(thumb.adjusted(0, 0, -1, -1))
+            painter.drawText(thumb, Qt.AlignCenter, "Image not available" if pixmap is None else "")
+
+        pptx_paths = index.data(PptxPathsRole) or []
+        for rect, label in zip(self.deck_rects(option.rect, len(pptx_paths)), self.deck_labels(pptx_paths)):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.state = QStyle.State_Enabled | QStyle.State_Raised
+            button.text = option.fontMetrics.elidedText(label, Qt.ElideMiddle, rect.width() - 12)
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            pptx_paths = index.data(PptxPathsRole) or []
+            for row, rect in enumerate(self.deck_rects(option.rect, len(pptx_paths))):
+                if rect.contains(event.pos()):
+                    if row == MAX_DECK_ROWS - 1 and len(pptx_paths) > MAX_DECK_ROWS:
+                        self.show_more_decks(pptx_paths[row:], option.widget.viewport().mapToGlobal(rect.bottomLeft()))
+                    else:
+                        open_pptx(pptx_paths[row])
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+    def show_more_decks(self, pptx_paths, position):
+        menu = QMenu()
+        for pptx_path in pptx_paths:
+            menu.addAction(os.path.basename(pptx_path), lambda path=pptx_path: open_pptx(path))
+        menu.exec_(position)
+
+
+class GalleryView(QListView):
+    """
+    功能：虚拟化的图片网格。使用 QListView 的从左到右自动换行布局，所有格子大小相同（setUniformItemSizes），
+    只有可见的格子会被绘制，窗口大小变化时只重新计算位置，不创建或销毁任何控件，
+    因此内存占用和重排耗时与图库中的图片数量无关。右键菜单提供“复制图片”和“删除图片”。
+    缩略图由 AsyncThumbnailLoader 在后台解码：绘制时请求可见格子的缩略图，滚动或缩放停止 settle_ms 毫秒后
+    取消已滚出屏幕的请求，并以较低优先级预读前后 prefetch_rows 行。
+    show_cache_stats 为 True 时在右上角显示缩略图缓存的命中统计（调试用），并每隔 stats_log_interval 秒写一次日志。
+    与其他对象的关系：UI_Qt_v1 和 UIforWindows 的 ImageGalleryApp 使用它显示图片；删除确认后发出 deleteRequested(img_hash)，
+    由 ImageGalleryApp 删除CSV或数据库中的记录后调用 remove_image。
+    """
+
+    deleteRequested = pyqtSignal(str)
+
+    def __init__(self, images=(), parent=None, thumbnail_provider=None, prefetch_rows=2, settle_ms=80,
+                 show_cache_stats=False, stats_log_interval=30):
+        super().__init__(parent)
+        self.thumbnail_provider = thumbnail_provider or AsyncThumbnailLoader(parent=self)
+        self.prefetch_rows = prefetch_rows
+        self.thumbnail_provider.thumbnailReady.connect(self.on_thumbnail_ready)
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(settle_ms)
+        self.settle_timer.timeout.connect(self.update_requests)
+        self.verticalScrollBar().valueChanged.connect(self.settle_timer.start)
+
+        self.stats_label = None
+        if show_cache_stats and hasattr(self.thumbnail_provider, 'stats_text'):
+            self.stats_label = QLabel(self.viewport())
+            self.stats_label.setStyleSheet("background: rgba(0, 0, 0, 160); color: white; padding: 4px;")
+            self.stats_label.setAttribute(Qt.WA_TransparentForMouseEvents)
+            self.stats_timer = QTimer(self)
+            self.stats_timer.timeout.connect(self.update_cache_stats)
+            self.stats_timer.start(500)
+            self.stats_log_timer = QTimer(self)
+            self.stats_log_timer.timeout.connect(
+                lambda: logging.info(f"Thumbnail cache: {self.thumbnail_provider.stats()}"))
+            self.stats_log_timer.start(int(stats_log_interval * 1000))
+        self.image_model = ImageListModel(images, self)
+        self.setModel(self.image_model)
+        self.setItemDelegate(ImageTileDelegate(self.thumbnail_provider, self))
+
+        self.setViewMode(QListView.ListMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(500)
+        self.setSpacing(4)
+        self.setSelectionMode(QListView.SingleSelection)
+        self.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(40)
+        self.setMouseTracking(True)
+
+    def set_images(self, images):
+        self.image_model.set_images(images)
+        self.settle_timer.start()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.settle_timer.start()
+        if self.stats_label is not None:
+            self.update_cache_stats()
+
+    def update_cache_stats(self):
+        self.stats_label.setText(self.thumbnail_provider.stats_text())
+        self.stats_label.adjustSize()
+        self.stats_label.move(self.viewport().width() - self.stats_label.width() - 8, 8)
+        self.stats_label.raise_()
+
+    def grid_geometry(self):
+        """返回 (columns, first_top, row_height)：每行的格子数、第一行在视口中的位置（随滚动变为负数）和行距。"""
+        model = self.model()
+        first_rect = self.visualRect(model.index(0, 0))
+        columns = 1
+        while columns < model.rowCount() and self.visualRect(model.index(columns, 0)).top() == first_rect.top():
+            columns += 1
+        if columns < model.rowCount():
+            row_height = self.visualRect(model.index(columns, 0)).top() - first_rect.top()
+        else:
+            row_height = first_rect.height() + 2 * self.spacing()
+        return columns, first_rect.top(), max(1, row_height)
+
+    def visible_rows(self):
+        """返回可见格子的行号范围 (first, last)，没有格子时返回 None。格子大小相同，直接按行列计算，不逐个查找。"""
+        count = self.model().rowCount()
+        if count == 0:
+            return None
+        columns, first_top, row_height = self.grid_geometry()
+        first_line = max(0, -first_top // row_height)
+        last_line = max(first_line, (self.viewport().height() - first_top) // row_height)
+        first = min(count - 1, first_line * columns)
+        return first, min(count - 1, (last_line + 1) * columns - 1)
+
+    def update_requests(self):
+        rows = self.visible_rows()
+        if rows is None:
+            return
+        first, last = rows
+        columns = self.grid_geometry()[0]
+        prefetch_first = max(0, first - self.prefetch_rows * columns)
+        prefetch_last = min(self.model().rowCount() - 1, last + self.prefetch_rows * columns)
+        model = self.model()
+        visible = [model.index(row, 0).data(ImgPathRole) for row in range(first, last + 1)]
+        prefetch = [(model.index(row, 0).data(ImgPathRole), model.index(row, 0).data(ThumbPathRole))
+                    for row in itertools.chain(range(last + 1, prefetch_last + 1), range(prefetch_first, first))]
+        self.thumbnail_provider.prioritize(set(visible) | {img_path for img_path, _ in prefetch})
+        for img_path, thumb_path in prefetch:
+            self.thumbnail_provider.request(img_path, PREFETCH_PRIORITY, thumb_path)
+
+    def on_thumbnail_ready(self, img_path):
+        rows = self.visible_rows()
+        if rows is None:
+            return
+        for row in range(rows[0], rows[1] + 1):
+            index = self.model().index(row, 0)
+            if index.data(ImgPathRole) == img_path:
+                self.update(index)
+
+    def remove_image(self, img_hash):
+        return self.image_model.remove_image(img_hash)
+
+    def contextMenuEvent(self, event):
+        index = self.indexAt(event.pos())
+        if not index.isValid():
+            return
+        menu = QMenu(self)
+        copy_action = menu.addAction("复制图片")
+        delete_action = menu.addAction("删除图片")
+        action = menu.exec_(event.globalPos())
+        if action == copy_action:
+            # 复制原图，而不是缩略图
+            QApplication.clipboard().setPixmap(QPixmap(index.data(ImgPathRole)))
+        elif action == delete_action:
+            reply = QMessageBox.question(self, '删除确认', "你确定要删除这张图片吗？", QMessageBox.Yes | QMessageBox.No,
+                                         QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.deleteRequested.emit(index.data(ImgHashRole))
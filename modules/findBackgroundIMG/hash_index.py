@@ -0,0 +1,151 @@
+# hash_index.py
+import csv
+import logging
+import sqlite3
+from itertools import combinations
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(hash_a ^ hash_b).count('1')
+
+
+def hash_to_int(img_hash):
+    """imagehash 的十六进制字符串（如 'ffc3810000818181'）转为整数，整数原样返回。"""
+    return img_hash if isinstance(img_hash, int) else int(str(img_hash), 16)
+
+
+class HammingIndex:
+    """
+    功能：感知哈希（默认64位）的近似重复索引，支持查询“与某个哈希的汉明距离不超过 d 的所有图片”。
+    采用多索引哈希（multi-index hashing）：把哈希切成 chunks 段，每段建一个倒排表。若两个哈希的距离不超过 d，
+    则至少有一段的距离不超过 d // chunks，所以只需在每段的倒排表中查找这些邻近值，再对候选逐个验证，
+    不需要两两比较全部哈希。
+    与其他对象的关系：ImageManager 在提取时用它判断近似重复；也可以通过 from_sqlite / from_csv 单独加载后查询，
+    或用 find_groups 找出所有近似重复的图片组。
+    """
+
+    def __init__(self, hash_bits=64, chunks=4):
+        self.hash_bits = hash_bits
+        self.chunks = chunks
+        self.chunk_bits = hash_bits // chunks
+        self.chunk_mask = (1 << self.chunk_bits) - 1
+        self.items = {}  # hash_int -> [item, ...]
+        self.tables = [{} for _ in range(chunks)]  # 每段: chunk_value -> [hash_int, ...]
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, img_hash):
+        return hash_to_int(img_hash) in self.items
+
+    def split(self, hash_int):
+        return [(hash_int >> (i * self.chunk_bits)) & self.chunk_mask for i in range(self.chunks)]
+
+    def add(self, img_hash, item=None):
+        hash_int = hash_to_int(img_hash)
+        if hash_int not in self.items:
+            self.items[hash_int] = []
+            for table, chunk in zip(self.tables, self.split(hash_int)):
+                table.setdefault(chunk, []).append(hash_int)
+        if item is not None:
+            self.items[hash_int].append(item)
+
+    def remove(self, img_hash):
+        hash_int = hash_to_int(img_hash)
+        if self.items.pop(hash_int, None) is None:
+            return
+        for table, chunk in zip(self.tables, self.split(hash_int)):
+            bucket = table[chunk]
+            bucket.remove(hash_int)
+            if not bucket:
+                del table[chunk]
+
+    def chunk_neighbours(self, chunk, radius):
+        """返回与 chunk 的汉明距离不超过 radius 的所有取值。"""
+        yield chunk
+        for r in range(1, radius + 1):
+            for bits in combinations(range(self.chunk_bits), r):
+                flipped = chunk
+                for bit in bits:
+                    flipped ^= 1 << bit
+                yield flipped
+
+    def query(self, img_hash, max_distance):
+        """返回 [(distance, hash_hex, items), ...]，按距离从小到大排序。"""
+        hash_int = hash_to_int(img_hash)
+        radius = max_distance // self.chunks
+        candidates = set()
+        for table, chunk in zip(self.tables, self.split(hash_int)):
+            for value in self.chunk_neighbours(chunk, radius):
+                candidates.update(table.get(value, ()))
+
+        width = self.hash_bits // 4
+        results = []
+        for candidate in candidates:
+            distance = hamming_distance(hash_int, candidate)
+            if distance <= max_distance:
+                results.append((distance, format(candidate, f'0{width}x'), self.items[candidate]))
+        results.sort()
+        return results
+
+    def has_near_duplicate(self, img_hash, max_distance):
+        return bool(self.query(img_hash, max_distance))
+
+    def find_groups(self, max_distance):
+        """把距离不超过 max_distance 的哈希归为一组（传递闭包），只返回包含两个及以上哈希的组。"""
+        width = self.hash_bits // 4
+        visited = set()
+        groups = []
+        for hash_int in self.items:
+            if hash_int in visited:
+                continue
+            group = []
+            stack = [hash_int]
+            visited.add(hash_int)
+            while stack:
+                current = stack.pop()
+                group.append(current)
+                for _, neighbour_hex, _ in self.query(current, max_distance):
+                    neighbour = int(neighbour_hex, 16)
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        stack.append(neighbour)
+            if len(group) > 1:
+                groups.append([format(h, f'0{width}x') for h in group])
+        return groups
+
+    @classmethod
+    def from_sqlite(cls, db_path, table_name='image_ppt_mapping', **kwargs):
+        index = cls(**kwargs)
+        conn = sqlite3.connect(db_path)
+        try:
+            for img_hash, img_path in conn.execute(f"SELECT img_hash, img_path FROM {table_name}"):
+                if img_hash:
+                    index.add(img_hash, img_path)
+        finally:
+            conn.close()
+        logging.info(f"Loaded {len(index)} hashes into near-duplicate index.")
+        return index
+
+    @classmethod
+    def from_csv(cls, csv_path, **kwargs):
+        index = cls(**kwargs)
+        with open(csv_path, newline='', encoding='utf-8') as csv_file:
+            for row in csv.DictReader(csv_file):
+                if row['Image Hash']:
+                    index.add(row['Image Hash'], row['Image File'])
+        logging.info(f"Loaded {len(index)} hashes into near-duplicate index.")
+        return index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_path = "image_gallery.db"  # 数据库文件路径
+    max_distance = 4  # 汉明距离阈值
+
+    index = HammingIndex.from_sqlite(db_path)
+    for group in index.find_groups(max_distance):
+        print("近似重复的图片:")
+        for img_hash in group:
+            for img_path in index.items[hash_to_int(img_hash)]:
+                print(f"  {img_hash}  {img_path}")
@@ -0,0 +1,169 @@
+# hashing.py
+import io
+import logging
+import math
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+# 各种哈希在缩放后使用的图片尺寸 (宽, 高)，与 imagehash 的默认参数一致
+HASH_SIZES = {
+    'ahash': (8, 8),
+    'dhash': (9, 8),
+    'phash': (32, 32),
+}
+
+
+def dct_matrix(size, rows):
+    """DCT-II 变换矩阵的前 rows 行（与 scipy.fftpack.dct 默认的未归一化形式相同）。"""
+    k = np.arange(rows)[:, None]
+    n = np.arange(size)[None, :]
+    return 2 * np.cos(np.pi * k * (2 * n + 1) / (2 * size))
+
+
+PHASH_DCT = dct_matrix(32, 8)
+
+
+def throughput_report(images, nbytes, seconds):
+    """哈希吞吐量汇总，HashEngine.report 和 ImageProcessor 的运行统计共用。"""
+    divisor = seconds or math.inf
+    return {
+        'images': images,
+        'bytes': nbytes,
+        'seconds': round(seconds, 3),
+        'images_per_sec': round(images / divisor, 1),
+        'mb_per_sec': round(nbytes / divisor / 1024 / 1024, 2),
+    }
+
+
+def log_throughput(report):
+    logging.info(f"Hashed {report['images']} images in {report['seconds']}s "
+                 f"({report['images_per_sec']} images/s, {report['mb_per_sec']} MB/s).")
+
+
+def bits_to_hex(bits):
+    """把 (N, 64) 的布尔数组转为 imagehash 格式的十六进制字符串列表。"""
+    packed = np.packbits(bits.reshape(len(bits), -1), axis=1)
+    return [row.tobytes().hex() for row in packed]
+
+
+class HashEngine:
+    """
+    功能：批量计算图片的感知哈希（aHash、dHash、pHash）。每张图片只解码一次并缩放到哈希需要的尺寸，
+    然后用 NumPy 对整批图片一次性计算哈希，并统计吞吐量（只保留累计值，长期使用的实例占用的内存不会增长）。
+    传入 stats（RunStats）时每张图片的解码耗时记入 decode 阶段，解码的字节数记入 hashed_bytes 计数。
+    reduced 为 True 时按编码器支持的方式以较低分辨率解码（JPEG 使用 draft 模式按 1/2、1/4、1/8 缩放解码，
+    其他格式解码后先用 reduce 缩小），速度快得多，但得到的哈希可能与全尺寸解码有个别位不同，
+    因此对已有图库做去重时应保持与建库时相同的设置。reduced 为 False 时结果与 imagehash 完全一致。
+    与其他对象的关系：findBackgroundIMG_sqliteV1.scan_pptx_zip 用它为每个演示文稿中的全部候选图片批量计算哈希；
+    findBackgroudIMG_V2.decode_image 在 reduced_decode 模式下用它计算哈希，只有需要保存的图片才会完整解码。
+    """
+
+    def __init__(self, kinds=('ahash',), reduced=False, draft_factor=4, stats=None):
+        self.kinds = tuple(kinds)
+        self.reduced = reduced
+        target = max(max(HASH_SIZES[kind]) for kind in self.kinds)
+        self.min_size = max(64, draft_factor * target)  # 降低分辨率解码时至少保留的边长
+        self.images = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.decode_seconds = 0.0  # 解码和缩放的累计耗时
+        self.stats = stats
+
+    def reset(self):
+        """清零吞吐量统计，同一个实例用于多次运行时每次运行单独统计。"""
+        self.images = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def open_image(self, image_blob):
+        img = Image.open(io.BytesIO(image_blob))
+        if self.reduced:
+            if img.format == 'JPEG':
+                img.draft('L', (self.min_size, self.min_size))
+            else:
+                factor = min(img.size) // self.min_size
+                if factor > 1:
+                    img = img.reduce(factor)
+        return img.convert('L')
+
+    def hash_blobs(self, image_blobs):
+        """返回与 image_blobs 一一对应的列表，每项为 {kind: 哈希字符串}，无法解码的图片为 None。"""
+        start = time.perf_counter()
+        results = [None] * len(image_blobs)
+        pixels = {kind: [] for kind in self.kinds}
+        decoded = []
+        for i, image_blob in enumerate(image_blobs):
+            decode_start = time.perf_counter()
+            try:
+                img = self.open_image(image_blob)
+                resized = {kind: np.asarray(img.resize(HASH_SIZES[kind], Image.LANCZOS), dtype=np.float64)
+                           for kind in self.kinds}
+            except Exception as e:
+                logging.error(f"Error calculating image hash: {e}")
+                continue
+            decode_time = time.perf_counter() - decode_start
+            self.decode_seconds += decode_time
+            if self.stats is not None:
+                self.stats.add_time('decode', decode_time)
+                self.stats.count('hashed_bytes', len(image_blob))
+            for kind in self.kinds:
+                pixels[kind].append(resized[kind])
+            decoded.append(i)
+            self.bytes += len(image_blob)
+
+        if decoded:
+            hashes = {kind: self.hash_pixels(kind, np.stack(pixels[kind])) for kind in self.kinds}
+            for n, i in enumerate(decoded):
+                results[i] = {kind: hashes[kind][n] for kind in self.kinds}
+
+        self.images += len(decoded)
+        self.seconds += time.perf_counter() - start
+        return results
+
+    def hash_blob(self, image_blob):
+        return self.hash_blobs([image_blob])[0]
+
+    @staticmethod
+    def hash_pixels(kind, pixels):
+        """pixels 为 (N, 高, 宽) 的灰度数组，返回 N 个十六进制哈希字符串。"""
+        if kind == 'ahash':
+            bits = pixels > pixels.mean(axis=(1, 2), keepdims=True)
+        elif kind == 'dhash':
+            bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+        elif kind == 'phash':
+            low_freq = PHASH_DCT @ pixels @ PHASH_DCT.T
+            median = np.median(low_freq.reshape(len(pixels), -1), axis=1)
+            bits = low_freq > median[:, None, None]
+        else:
+            raise ValueError(f"Unknown hash kind: {kind}")
+        return bits_to_hex(bits)
+
+    def report(self):
+        return throughput_report(self.images, self.bytes, self.seconds)
+
+    def log_report(self):
+        report = self.report()
+        log_throughput(report)
+        return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    image_folder = "/Users/birdmanoutman/上汽/backgroundIMGsource"  # 用于测试吞吐量的图片文件夹
+    batch_size = 64
+
+    blobs = []
+    for file in sorted(os.listdir(image_folder)):
+        if file.lower().endswith(('.jpg', '.jpeg', '.png')):
+            with open(os.path.join(image_folder, file), 'rb') as f:
+                blobs.append(f.read())
+
+    for reduced in (False, True):
+        engine = HashEngine(kinds=('ahash', 'dhash', 'phash'), reduced=reduced)
+        for start in range(0, len(blobs), batch_size):
+            engine.hash_blobs(blobs[start:start + batch_size])
+        print(f"reduced={reduced}: {engine.report()}")
@@ -0,0 +1,82 @@
+# image_verifier.py
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# 图库表中记录图片文件格式、尺寸和能否解码的列；decodable 为 NULL 表示尚未检查
+METADATA_COLUMNS = {
+    'img_format': 'TEXT',
+    'img_width': 'INTEGER',
+    'img_height': 'INTEGER',
+    'decodable': 'INTEGER',
+}
+# 校验时按不超过该尺寸的分辨率解码（JPEG 使用 draft 在解码时缩小），只为确认数据完整，不需要原尺寸像素
+VERIFY_DRAFT_SIZE = (256, 256)
+
+
+def format_from_path(img_path):
+    """按扩展名得到 PIL 的格式名（如 'JPEG'），不读取文件。"""
+    return Image.registered_extensions().get(os.path.splitext(img_path)[1].lower())
+
+
+def saved_image_metadata(img, img_path):
+    """提取时刚保存、已经解码过的图片的元数据列，不再读取文件。"""
+    width, height = img.size
+    return {'img_format': format_from_path(img_path), 'img_width': width, 'img_height': height, 'decodable': 1}
+
+
+def file_metadata(img_path):
+    """打开并以较低分辨率完整解码一遍图片文件，返回元数据列；文件不存在或无法解码时 decodable 为 0。"""
+    try:
+        with Image.open(img_path) as img:
+            img_format = img.format
+            width, height = img.size
+            img.draft('RGB', VERIFY_DRAFT_SIZE)
+            img.load()
+        return {'img_format': img_format, 'img_width': width, 'img_height': height, 'decodable': 1}
+    except Exception as e:
+        logging.info(f"Image not decodable: {img_path} ({e})")
+        return {'img_format': None, 'img_width': None, 'img_height': None, 'decodable': 0}
+
+
+def verify_images(db_path, table_name='image_ppt_mapping', workers=8, recheck=False, batch_size=500):
+    """为图库表中尚未检查（recheck 为 True 时为全部）的图片填写格式、尺寸和能否解码。
+    图片由 workers 个线程并行解码（PIL 解码时释放GIL），结果每 batch_size 条提交一次，中断后下次从未检查的记录继续。
+    返回检查的图片数。"""
+    # 旧表的补列使用提取程序的 SQLiteManager；在函数内导入，避免与 findBackgroundIMG_sqliteV1 循环导入
+    from modules.findBackgroundIMG.findBackgroundIMG_sqliteV1 import SQLiteManager
+    db_manager = SQLiteManager(db_path)
+    db_manager.connect()
+    conn, cursor = db_manager.conn, db_manager.cursor
+    db_manager.add_missing_columns(table_name, METADATA_COLUMNS)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_decodable ON {table_name} (decodable)")
+    conn.commit()
+    where = "" if recheck else " WHERE decodable IS NULL"
+    cursor.execute(f"SELECT id, img_path FROM {table_name}{where}")
+    rows = [(image_id, img_path) for image_id, img_path in cursor.fetchall() if img_path]
+
+    sql = (f"UPDATE {table_name} SET img_format=:img_format, img_width=:img_width, img_height=:img_height, "
+           f"decodable=:decodable WHERE id=:id")
+    checked = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            updates = [dict(metadata, id=image_id)
+                       for (image_id, _), metadata in zip(batch, executor.map(file_metadata, [p for _, p in batch]))]
+            cursor.executemany(sql, updates)
+            conn.commit()
+            checked += len(updates)
+    db_manager.close()
+    logging.info(f"Verified {checked} images in {table_name}.")
+    return checked
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db_path = "image_gallery.db"  # 数据库文件路径
+
+    # 默认只检查新记录，加上 --recheck 时重新检查全部图片
+    verify_images(db_path, recheck="--recheck" in sys.argv)
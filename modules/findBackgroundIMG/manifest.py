@@ -0,0 +1,99 @@
+# manifest.py
+import logging
+import os
+import sqlite3
+import time
+
+from modules.findBackgroundIMG.utils import file_digest
+
+UNCHANGED = 'unchanged'
+MODIFIED = 'modified'
+NEW = 'new'
+
+
+class PPTXManifest:
+    """
+    功能：记录已经处理过的PPTX文件（路径、大小、修改时间以及可选的内容摘要），用于增量扫描：
+    未变化的文件直接跳过，修改过的文件重新处理，已删除的文件从清单中清除。
+    与其他对象的关系：ImageExtractor 在遍历时调用 check 判断是否需要处理，处理完成后调用 record；
+    findBackgroudIMG_V2.main 也用它来跳过未变化的文件。它可以共用 SQLiteManager 的连接，也可以单独打开一个数据库文件。
+    """
+
+    def __init__(self, conn, table_name='pptx_manifest', use_digest=False, autocommit=True):
+        self.conn = conn
+        self.table_name = table_name
+        self.use_digest = use_digest
+        self.autocommit = autocommit  # False 时 record 不提交，由共用连接的 BatchedSQLiteManager 在写入图片时一并提交
+        self.pending = {}  # pptx_path -> (size, mtime_ns, digest)，check 时记录的状态，record 时写入
+
+    @classmethod
+    def open(cls, db_path, table_name='pptx_manifest', use_digest=False):
+        manifest = cls(sqlite3.connect(db_path), table_name, use_digest)
+        manifest.create_table()
+        return manifest
+
+    def create_table(self):
+        try:
+            self.conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.table_name} (
+                    pptx_path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    digest TEXT,
+                    processed_at REAL
+                )''')
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error creating manifest table: {e}")
+            raise e
+
+    def check(self, pptx_path, stat=None):
+        """比较文件当前状态与清单记录，返回 UNCHANGED / MODIFIED / NEW。stat 为遍历目录时已经取得的文件状态（见 PPTXWalker）。"""
+        stat = stat or os.stat(pptx_path)
+        row = self.conn.execute(f"SELECT size, mtime_ns, digest FROM {self.table_name} WHERE pptx_path=?",
+                                (pptx_path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return UNCHANGED
+
+        digest = file_digest(pptx_path) if self.use_digest else None
+        if row is not None and digest is not None and row[2] == digest:
+            # 内容没有变化（例如只是被复制或touch过），更新时间戳后跳过
+            self.pending[pptx_path] = (stat.st_size, stat.st_mtime_ns, digest)
+            self.record(pptx_path)
+            return UNCHANGED
+
+        self.pending[pptx_path] = (stat.st_size, stat.st_mtime_ns, digest)
+        return NEW if row is None else MODIFIED
+
+    def record(self, pptx_path):
+        """文件处理完成后写入清单。使用 check 时的文件状态，处理过程中被修改的文件会在下次运行时重新处理。"""
+        size, mtime_ns, digest = self.pending.pop(pptx_path)
+        try:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table_name} (pptx_path, size, mtime_ns, digest, processed_at) "
+                f"VALUES (?, ?, ?, ?, ?)",
+                (pptx_path, size, mtime_ns, digest, time.time()))
+            if self.autocommit:
+                self.conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error recording manifest entry: {e}")
+            raise e
+
+    def purge_missing(self, src_folder, seen_paths):
+        """删除 src_folder 下本次遍历没有出现的文件记录，返回被删除的路径列表。"""
+        prefix = os.path.join(src_folder, '')
+        rows = self.conn.execute(f"SELECT pptx_path FROM {self.table_name}").fetchall()
+        missing = [path for (path,) in rows if path.startswith(prefix) and path not in seen_paths]
+        try:
+            self.conn.executemany(f"DELETE FROM {self.table_name} WHERE pptx_path=?", [(p,) for p in missing])
+            if self.autocommit:
+                self.conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error purging manifest entries: {e}")
+            raise e
+        if missing:
+            logging.info(f"Purged {len(missing)} deleted PPTX files from manifest.")
+        return missing
+
+    def close(self):
+        self.conn.close()
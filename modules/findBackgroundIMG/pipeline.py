@@ -0,0 +1,156 @@
+# pipeline.py
+import logging
+import queue
+import threading
+import time
+
+
+class ExtractionPipeline:
+    """
+    功能：把提取过程拆成三个阶段并行执行：读取（readers 个线程预先读取PPTX文件的全部字节，适合网络卷上的慢速读取）、
+    解码（decode 提交到CPU进程池，解析压缩包、解码图片并计算哈希）、写入（调用 run 的线程作为唯一的写入者，保存图片文件和数据库记录）。
+    阶段之间使用有界队列，同时处理中的文件数不超过 window，任何一个阶段变慢时上游会自动等待，内存占用有上限。
+    写入阶段按 paths 的顺序消费结果，因此结果与串行模式一致。
+    stage_depths 返回各阶段当前积压的文件数：read 为等待读取的文件，decode 为已读取、正在或等待解码的文件，
+    write 为已解码、等待写入的文件；积压最多的阶段的下游就是瓶颈。运行中每隔 report_interval 秒记录一次，结束时记录平均值和最大值。
+    与其他对象的关系：ImageExtractor 在 pipeline 模式下创建它，decode 返回进程池的 Future，save 为 ImageExtractor.save_records。
+    """
+
+    def __init__(self, decode, save, readers=4, window=32, report_interval=10.0):
+        self.decode = decode  # decode(pptx_path, data) -> Future，结果为 scan 的图片记录列表
+        self.save = save  # save(pptx_path, records)，只在写入线程中调用
+        self.readers = max(1, int(readers or 1))
+        self.window = max(self.readers, int(window or 1))
+        self.report_interval = report_interval
+        self.read_queue = queue.Queue(maxsize=self.window)
+        self.write_queue = queue.Queue(maxsize=self.window)
+        self.slots = threading.Semaphore(self.window)
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.decoding = 0
+        self.active_readers = 0
+        self.samples = {'read': [], 'decode': [], 'write': []}
+
+    def stage_depths(self):
+        with self.lock:
+            decoding = self.decoding
+        return {'read': self.read_queue.qsize(), 'decode': decoding, 'write': self.write_queue.qsize()}
+
+    def feed(self, paths):
+        try:
+            for seq, pptx_path in enumerate(paths):
+                # 写入阶段每完成一个文件释放一个名额，同时处理中的文件数不超过 window
+                while not self.slots.acquire(timeout=0.1):
+                    if self.stop.is_set():
+                        return
+                if self.stop.is_set():
+                    return
+                self.read_queue.put((seq, pptx_path))
+        finally:
+            for _ in range(self.readers):
+                self.read_queue.put(None)
+
+    def read(self):
+        try:
+            while True:
+                item = self.read_queue.get()
+                if item is None or self.stop.is_set():
+                    break
+                seq, pptx_path = item
+                try:
+                    with open(pptx_path, 'rb') as f:
+                        data = f.read()
+                    future = self.decode(pptx_path, data)
+                except Exception as e:
+                    future = e
+                else:
+                    with self.lock:
+                        self.decoding += 1
+                    future.add_done_callback(self.decoded)
+                self.write_queue.put((seq, pptx_path, future))
+        finally:
+            with self.lock:
+                self.active_readers -= 1
+                last_reader = self.active_readers == 0
+            if last_reader:
+                self.write_queue.put(None)
+
+    def decoded(self, future):
+        with self.lock:
+            self.decoding -= 1
+
+    def run(self, paths):
+        self.active_readers = self.readers
+        threads = [threading.Thread(target=self.feed, args=(paths,), name='pptx-feeder', daemon=True)]
+        threads += [threading.Thread(target=self.read, name=f'pptx-reader-{i}', daemon=True)
+                    for i in range(self.readers)]
+        for thread in threads:
+            thread.start()
+        try:
+            self.write()
+        except BaseException:
+            self.shutdown(threads)
+            raise
+        for thread in threads:
+            thread.join()
+        self.log_summary()
+
+    def write(self):
+        ready = {}  # seq -> (pptx_path, future)，读取线程完成的顺序可能与遍历顺序不同
+        next_seq = 0
+        last_report = time.monotonic()
+        while True:
+            item = self.write_queue.get()
+            if item is not None:
+                seq, pptx_path, future = item
+                ready[seq] = (pptx_path, future)
+            while next_seq in ready:
+                pptx_path, future = ready.pop(next_seq)
+                self.sample()
+                if isinstance(future, Exception):
+                    logging.error(f"Error reading PPTX: {future}")
+                    raise future
+                try:
+                    records = future.result()
+                except Exception as e:
+                    logging.error(f"Error processing PPTX: {e}")
+                    raise e
+                self.save(pptx_path, records)
+                next_seq += 1
+                self.slots.release()
+            if time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                logging.info(f"Pipeline queue depths: {self.stage_depths()}")
+            if item is None:
+                break
+
+    def sample(self):
+        for stage, depth in self.stage_depths().items():
+            self.samples[stage].append(depth)
+
+    def shutdown(self, threads):
+        """出错时停止读取，清空队列使阻塞中的线程退出。"""
+        self.stop.set()
+        while any(thread.is_alive() for thread in threads):
+            for stage_queue in (self.read_queue, self.write_queue):
+                try:
+                    while True:
+                        item = stage_queue.get_nowait()
+                        if stage_queue is self.write_queue and item is not None and hasattr(item[2], 'cancel'):
+                            item[2].cancel()
+                except queue.Empty:
+                    pass
+            for thread in threads:
+                thread.join(timeout=0.05)
+
+    def report(self):
+        report = {}
+        for stage, samples in self.samples.items():
+            report[stage] = {
+                'mean': round(sum(samples) / len(samples), 2) if samples else 0,
+                'max': max(samples, default=0),
+            }
+        return report
+
+    def log_summary(self):
+        logging.info(f"Pipeline queue depths (mean/max per stage): {self.report()}")
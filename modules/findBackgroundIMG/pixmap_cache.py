@@ -0,0 +1,156 @@
+# pixmap_cache.py
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import QStandardPaths
+from PyQt5.QtGui import QImage
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024  # 内存中缩略图的总字节数上限
+
+
+def default_disk_cache_root():
+    """系统的缓存目录（Linux 为 ~/.cache，Windows 为 %LOCALAPPDATA%\\cache）下的 findBackgroundIMG/thumbnails。"""
+    cache_root = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    return os.path.join(cache_root, "findBackgroundIMG", "thumbnails")
+
+
+def pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+class CacheCounters:
+    """线程安全的命中/未命中计数，工作线程（磁盘层）和GUI线程（内存层）都会更新。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def add(self, name, n=1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+
+class PixmapLRU:
+    """
+    功能：缩略图的内存缓存，按最近使用顺序淘汰，所有 QPixmap 的像素字节数之和不超过 budget_bytes。
+    只在GUI线程中使用（QPixmap 不能跨线程）。
+    与其他对象的关系：AsyncThumbnailLoader 的第一层缓存，未命中时再查 DiskThumbnailCache 或解码原图。
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_MEMORY_BUDGET, counters=None):
+        self.budget_bytes = budget_bytes
+        self.counters = counters or CacheCounters()
+        self.items = OrderedDict()  # key -> QPixmap
+        self.used_bytes = 0
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key):
+        pixmap = self.items.get(key)
+        if pixmap is None:
+            self.counters.add('memory_misses')
+            return None
+        self.items.move_to_end(key)
+        self.counters.add('memory_hits')
+        return pixmap
+
+    def put(self, key, pixmap):
+        if key in self.items:
+            self.used_bytes -= pixmap_bytes(self.items.pop(key))
+        size = pixmap_bytes(pixmap)
+        if size > self.budget_bytes:
+            return
+        self.items[key] = pixmap
+        self.used_bytes += size
+        while self.used_bytes > self.budget_bytes:
+            _, evicted = self.items.popitem(last=False)
+            self.used_bytes -= pixmap_bytes(evicted)
+            self.counters.add('memory_evictions')
+
+    def clear(self):
+        self.items.clear()
+        self.used_bytes = 0
+
+
+class DiskThumbnailCache:
+    """
+    功能：缩略图的磁盘缓存，程序重启后仍然有效。键为 (原图绝对路径, 文件大小, 修改时间, 缩略图尺寸) 的摘要，
+    原图被修改后键随之变化，旧缩略图不再被使用。文件按键分片保存为 root/<键前两位>/<键>.jpg（带透明通道的为 .png）。
+    load 和 save 在工作线程中调用，只使用 QImage。
+    与其他对象的关系：AsyncThumbnailLoader 的第二层缓存；与提取时生成的 ThumbnailStore 相互独立，
+    任何能打开的图片（CSV中的路径、数据库中的路径）都可以缓存。
+    """
+
+    def __init__(self, root=None, counters=None, quality=85):
+        self.root = root or default_disk_cache_root()
+        self.counters = counters or CacheCounters()
+        self.quality = quality
+
+    def cache_key(self, img_path, size):
+        """原图不存在时返回 None。"""
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            return None
+        identity = f"{os.path.abspath(img_path)}|{stat.st_size}|{stat.st_mtime_ns}|{size}"
+        return hashlib.blake2b(identity.encode('utf-8'), digest_size=16).hexdigest()
+
+    def entry_path(self, key, extension):
+        return os.path.join(self.root, key[:2], f"{key}.{extension}")
+
+    def load(self, img_path, size):
+        """返回缓存的缩略图 QImage，没有缓存时返回 None。"""
+        key = self.cache_key(img_path, size)
+        if key is not None:
+            for extension in ('jpg', 'png'):
+                path = self.entry_path(key, extension)
+                if os.path.exists(path):
+                    image = QImage(path)
+                    if not image.isNull():
+                        self.counters.add('disk_hits')
+                        return image
+        self.counters.add('disk_misses')
+        return None
+
+    def save(self, img_path, size, image):
+        key = self.cache_key(img_path, size)
+        if key is None or image.isNull():
+            return
+        extension = 'png' if image.hasAlphaChannel() else 'jpg'
+        path = self.entry_path(key, extension)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，其他线程或下次启动不会读到写了一半的文件
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            if image.save(tmp_path, extension.upper(), self.quality if extension == 'jpg' else -1):
+                os.replace(tmp_path, path)
+                self.counters.add('disk_writes')
+        except OSError as e:
+            logging.error(f"Error writing thumbnail cache {path}: {e}")
+
+
+def format_cache_stats(counts, memory_cache=None):
+    """调试浮层和日志中显示的一行统计。"""
+    memory_total = counts.get('memory_hits', 0) + counts.get('memory_misses', 0)
+    disk_total = counts.get('disk_hits', 0) + counts.get('disk_misses', 0)
+    parts = [
+        f"内存 {counts.get('memory_hits', 0)}/{memory_total} 命中",
+        f"磁盘 {counts.get('disk_hits', 0)}/{disk_total} 命中",
+        f"缩略图文件 {counts.get('thumbnail_files', 0)}",
+        f"解码 {counts.get('decoded', 0)}",
+    ]
+    if memory_cache is not None:
+        parts.append(f"{len(memory_cache)} 张 {memory_cache.used_bytes / 1024 / 1024:.1f}/"
+                     f"{memory_cache.budget_bytes / 1024 / 1024:.0f} MB")
+    return "  ".join(parts)
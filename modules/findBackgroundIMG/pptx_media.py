@@ -0,0 +1,165 @@
+# pptx_media.py
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+
+NS = {
+    'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+R_ID = f"{{{NS['r']}}}id"
+R_EMBED = f"{{{NS['r']}}}embed"
+# 关系类型的结尾部分，完整类型如 http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout
+REL_SLIDE_LAYOUT = '/slideLayout'
+REL_SLIDE_MASTER = '/slideMaster'
+
+# 与 python-pptx 的 slide.shapes 一致：只有这些子元素会被计入形状序号
+SHAPE_TAGS = {f"{{{NS['p']}}}{tag}" for tag in ('sp', 'grpSp', 'graphicFrame', 'cxnSp', 'pic', 'contentPart')}
+PIC_TAG = f"{{{NS['p']}}}pic"
+
+
+def rels_part_name(part_name):
+    """返回某个部件对应的关系文件路径，如 ppt/slides/slide1.xml -> ppt/slides/_rels/slide1.xml.rels。"""
+    directory, file_name = posixpath.split(part_name)
+    return posixpath.join(directory, '_rels', f"{file_name}.rels")
+
+
+class PPTXMediaReader:
+    """
+    功能：不经过 python-pptx 对象模型，直接从PPTX压缩包读取 presentation.xml、幻灯片XML和关系文件，
+    把图片形状以及幻灯片、版式和母版的图片背景解析为对应的 ppt/media/* 部件名，并按需读取媒体部件的原始字节。
+    与其他对象的关系：findBackgroundIMG_sqliteV1.scan_pptx_zip 和 findBackgroudIMG_V2.save_slide_images_zip 使用它，
+    以便同一个媒体部件在一个演示文稿中只读取、解码和计算哈希一次。
+    幻灯片顺序和形状序号与 python-pptx 保持一致，因此生成的图片文件名与原来的实现相同。
+    """
+
+    def __init__(self, pptx_path):
+        self.pptx_path = pptx_path
+        self.zip_file = zipfile.ZipFile(pptx_path)
+        self.presentation = self.read_xml('ppt/presentation.xml')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.zip_file.close()
+
+    def read_xml(self, part_name):
+        return ET.fromstring(self.zip_file.read(part_name))
+
+    def relationships(self, part_name, rel_type=None):
+        """返回 {rId: 目标部件名}，忽略外部链接。rel_type 不为空时只返回类型以它结尾的关系（如 REL_SLIDE_LAYOUT）。"""
+        try:
+            rels = self.read_xml(rels_part_name(part_name))
+        except KeyError:
+            return {}
+        base_dir = posixpath.dirname(part_name)
+        targets = {}
+        for rel in rels.findall('rel:Relationship', NS):
+            if rel.get('TargetMode') == 'External':
+                continue
+            if rel_type is not None and not rel.get('Type', '').endswith(rel_type):
+                continue
+            target = rel.get('Target')
+            if target.startswith('/'):
+                targets[rel.get('Id')] = target.lstrip('/')
+            else:
+                targets[rel.get('Id')] = posixpath.normpath(posixpath.join(base_dir, target))
+        return targets
+
+    def slide_size(self):
+        sld_sz = self.presentation.find('p:sldSz', NS)
+        if sld_sz is None:
+            return None, None
+        return int(sld_sz.get('cx')), int(sld_sz.get('cy'))
+
+    def slide_part_names(self):
+        """按演示文稿中的播放顺序返回幻灯片部件名。"""
+        rels = self.relationships('ppt/presentation.xml')
+        return [rels[sld_id.get(R_ID)] for sld_id in self.presentation.findall('p:sldIdLst/p:sldId', NS)]
+
+    def iter_pictures(self, is_candidate=None):
+        """逐个返回顶层图片形状：(slide_idx, shape_idx, media_part_name, width, height)。
+
+        只包含 python-pptx 中 shape_type 为图片(13)的形状：占位符图片和视频形状被跳过，外部链接的图片也被跳过。
+        is_candidate(width, height, slide_width, slide_height) 为候选筛选条件（如 utils.is_size_similar），
+        只根据XML中的形状尺寸和幻灯片尺寸判断，不满足条件的图片不会解析关系文件，更不会读取图片数据。
+        """
+        slide_width, slide_height = self.slide_size()
+        for slide_idx, slide_part in enumerate(self.slide_part_names()):
+            slide = self.read_xml(slide_part)
+            sp_tree = slide.find('p:cSld/p:spTree', NS)
+            if sp_tree is None:
+                continue
+            rels = None
+            shape_elms = (child for child in sp_tree if child.tag in SHAPE_TAGS)
+            for shape_idx, shape in enumerate(shape_elms):
+                if shape.tag != PIC_TAG or not self.is_plain_picture(shape):
+                    continue
+                width, height = self.picture_extents(shape)
+                if is_candidate is not None and not is_candidate(width, height, slide_width, slide_height):
+                    continue
+                blip = shape.find('p:blipFill/a:blip', NS)
+                if blip is None or blip.get(R_EMBED) is None:
+                    continue
+                if rels is None:
+                    rels = self.relationships(slide_part)
+                media_part = rels.get(blip.get(R_EMBED))
+                if media_part is None:
+                    continue
+                yield slide_idx, shape_idx, media_part, width, height
+
+    def iter_backgrounds(self):
+        """逐个返回使用图片填充的背景：(label, media_part_name)。
+
+        依次检查每张幻灯片、它使用的版式和母版的 <p:cSld><p:bg><p:bgPr><a:blipFill>。版式和母版被许多幻灯片共用，
+        每个演示文稿中只解析一次；label 对幻灯片为 "<序号>_bg"，对版式和母版为 "<部件名>_bg"（如 slideLayout2_bg）。
+        引用主题背景样式（p:bgRef）的背景不在检查范围内。
+        """
+        visited = set()
+        for slide_idx, slide_part in enumerate(self.slide_part_names()):
+            media_part = self.background_media(slide_part)
+            if media_part is not None:
+                yield f"{slide_idx + 1}_bg", media_part
+            for layout_part in self.relationships(slide_part, REL_SLIDE_LAYOUT).values():
+                for part in [layout_part] + list(self.relationships(layout_part, REL_SLIDE_MASTER).values()):
+                    if part in visited:
+                        continue
+                    visited.add(part)
+                    media_part = self.background_media(part)
+                    if media_part is not None:
+                        yield f"{posixpath.splitext(posixpath.basename(part))[0]}_bg", media_part
+
+    def background_media(self, part_name):
+        """返回幻灯片、版式或母版的背景图片部件名，背景不是图片填充时返回 None。"""
+        try:
+            blip = self.read_xml(part_name).find('p:cSld/p:bg/p:bgPr/a:blipFill/a:blip', NS)
+        except KeyError:
+            return None
+        if blip is None or blip.get(R_EMBED) is None:
+            return None
+        return self.relationships(part_name).get(blip.get(R_EMBED))
+
+    @staticmethod
+    def is_plain_picture(pic):
+        nv_pr = pic.find('p:nvPicPr/p:nvPr', NS)
+        if nv_pr is None:
+            return True
+        if nv_pr.find('p:ph', NS) is not None:
+            return False
+        return nv_pr.find('a:videoFile', NS) is None
+
+    @staticmethod
+    def picture_extents(pic):
+        ext = pic.find('p:spPr/a:xfrm/a:ext', NS)
+        if ext is None:
+            return 0, 0
+        return int(ext.get('cx')), int(ext.get('cy'))
+
+    def read_media(self, part_name):
+        return self.zip_file.read(part_name)
@@ -0,0 +1,68 @@
+# run_journal.py
+import json
+import logging
+import os
+import time
+
+
+class RunJournal:
+    """
+    功能：记录一次长时间提取运行的进度。每处理完一个PPTX文件，在其CSV记录写入并落盘后追加一行
+    {"pptx": 路径, "offset": CSV文件长度} 并 fsync，因此日志中的每个文件都已经完整写入CSV。
+    中断后以 resume 方式重新运行时，把CSV截断到最后记录的长度（丢弃未完成文件的半截记录），跳过已完成的文件。
+    与其他对象的关系：findBackgroudIMG_V2.main 使用它实现 --resume。
+    """
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.completed = set()
+        self.last_offset = 0
+        self.file = None
+
+    def exists(self):
+        return os.path.exists(self.journal_path)
+
+    def start(self, csv_offset):
+        """开始新的运行，csv_offset 为写完表头后的CSV长度。"""
+        self.completed = set()
+        self.last_offset = csv_offset
+        self.file = open(self.journal_path, 'w', encoding='utf-8')
+        self.append({'started': time.time(), 'offset': csv_offset})
+
+    def resume(self):
+        """读取已有日志，返回已完成的文件集合。最后一行如果因中断而不完整，把日志截断到最后一个完整行的末尾，
+        之后追加的记录不会接在半行后面（否则下次 resume 时它们都会被忽略）。"""
+        valid_end = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line.decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    break
+                if 'pptx' in entry:
+                    self.completed.add(entry['pptx'])
+                self.last_offset = entry['offset']
+                valid_end += len(line)
+        if valid_end < os.path.getsize(self.journal_path):
+            logging.info(f"Discarding incomplete journal entry at byte {valid_end} of {self.journal_path}.")
+            os.truncate(self.journal_path, valid_end)
+        logging.info(f"Resuming run: {len(self.completed)} PPTX files already completed.")
+        self.file = open(self.journal_path, 'a', encoding='utf-8')
+        return self.completed
+
+    def mark_done(self, pptx_path, csv_offset):
+        self.completed.add(pptx_path)
+        self.last_offset = csv_offset
+        self.append({'pptx': pptx_path, 'offset': csv_offset})
+
+    def append(self, entry):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def finish(self):
+        """运行完成后删除日志。"""
+        self.file.close()
+        os.remove(self.journal_path)
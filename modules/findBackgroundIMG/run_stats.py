@@ -0,0 +1,188 @@
+# run_stats.py
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+from modules.findBackgroundIMG.hashing import throughput_report
+
+# 耗时直方图各桶的上界（毫秒），从 0.01 ms 到 10 分钟按约 1.25 倍递增；分位数在桶内线性插值，相对误差不超过一个桶宽
+BUCKET_BOUNDS_MS = [float(bound) for bound in np.geomspace(0.01, 600000, 81)]
+
+
+def timed(stats, stage):
+    """stats 为 None 时不计时，便于在可选统计的函数中直接使用 with timed(stats, ...)。"""
+    return stats.timer(stage) if stats is not None else nullcontext()
+
+
+class StageTiming:
+    """一个阶段的耗时统计：次数、总耗时、最小/最大值和固定桶的直方图，内存占用与样本数无关，可以跨进程合并。"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = None
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)  # 最后一个桶收集超过最大上界的样本
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.min_ms = ms if self.min_ms is None else min(self.min_ms, ms)
+        self.max_ms = ms if self.max_ms is None else max(self.max_ms, ms)
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+
+    def merge(self, other):
+        if not other.count:
+            return
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.min_ms = other.min_ms if self.min_ms is None else min(self.min_ms, other.min_ms)
+        self.max_ms = other.max_ms if self.max_ms is None else max(self.max_ms, other.max_ms)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile_ms(self, q):
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulative = 0
+        for index, n in enumerate(self.buckets):
+            if n and cumulative + n >= rank:
+                lower = BUCKET_BOUNDS_MS[index - 1] if index > 0 else 0.0
+                upper = BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+                value = lower + (upper - lower) * (rank - cumulative) / n
+                return round(min(max(value, self.min_ms), self.max_ms), 3)
+            cumulative += n
+        return round(self.max_ms, 3)
+
+
+class RunStats:
+    """
+    功能：记录一次提取运行中各阶段的耗时（timer / add_time，记入每个阶段的 StageTiming 直方图，用于估计 p50/p95，
+    内存占用不随文件和图片数量增长）和计数（count），
+    运行结束时生成机器可读的汇总：文件/秒、图片/秒、读取字节数、解码耗时 p50/p95、数据库耗时、跳过的重复图片数等，
+    可以写成JSON，也可以写成 Prometheus node_exporter textfile collector 使用的文本格式，供定时任务监控。
+    阶段名：scan（解析一个PPTX文件）、decode（解码一张图片并计算哈希）、save（保存图片文件和缩略图）、db（数据库查询和写入）。
+    与其他对象的关系：ImageProcessor 创建它并传给 SQLiteManager、ImageManager 和 ImageExtractor；
+    工作进程中的 scan 使用各自的 RunStats，结果随图片记录返回后由 merge 合并。
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.finished = None
+        self.counters = {}  # 名称 -> 数量
+        self.timings = {}  # 阶段 -> StageTiming
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage, seconds):
+        timing = self.timings.get(stage)
+        if timing is None:
+            timing = self.timings[stage] = StageTiming()
+        timing.add(seconds * 1000)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        for name, n in other.counters.items():
+            self.count(name, n)
+        for stage, timing in other.timings.items():
+            self.timings.setdefault(stage, StageTiming()).merge(timing)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def hash_throughput(self):
+        """解码并计算哈希的吞吐量（见 hashing.throughput_report）。耗时为 decode 阶段的累计值，
+        并行时是所有工作进程耗时之和，因此是单个进程的吞吐量。"""
+        decode = self.timings.get('decode', StageTiming())
+        return throughput_report(decode.count, self.counters.get('hashed_bytes', 0), decode.total_ms / 1000)
+
+    def report(self):
+        elapsed = (self.finished or time.perf_counter()) - self.start
+        files = self.counters.get('files', 0)
+        images = self.counters.get('images', 0)
+        decode = self.timings.get('decode', StageTiming())
+        return {
+            'started_at': round(self.started_at, 3),
+            'elapsed_s': round(elapsed, 3),
+            'files': files,
+            'images': images,
+            'files_per_sec': round(files / elapsed, 2) if elapsed else 0.0,
+            'images_per_sec': round(images / elapsed, 2) if elapsed else 0.0,
+            'bytes_read': self.counters.get('bytes_read', 0),
+            'decode_ms_p50': decode.percentile_ms(50),
+            'decode_ms_p95': decode.percentile_ms(95),
+            'hash_images_per_sec': self.hash_throughput()['images_per_sec'],
+            'hash_mb_per_sec': self.hash_throughput()['mb_per_sec'],
+            'db_ms': round(self.timings.get('db', StageTiming()).total_ms, 3),
+            'images_saved': self.counters.get('images_saved', 0),
+            'duplicates_skipped': self.counters.get('duplicates_skipped', 0),
+            'counters': dict(self.counters),
+            'stages': {
+                stage: {
+                    'count': timing.count,
+                    'total_ms': round(timing.total_ms, 3),
+                    'p50_ms': timing.percentile_ms(50),
+                    'p95_ms': timing.percentile_ms(95),
+                }
+                for stage, timing in self.timings.items()
+            },
+        }
+
+    def log_report(self):
+        report = self.report()
+        logging.info(f"Run summary: {json.dumps(report, ensure_ascii=False)}")
+        return report
+
+    def write_json(self, path):
+        write_atomic(path, json.dumps(self.report(), ensure_ascii=False, indent=2) + '\n')
+
+    def write_prometheus(self, path, prefix='findbackgroundimg'):
+        """写成 Prometheus textfile 格式（node_exporter 的 --collector.textfile.directory 下的 .prom 文件）。"""
+        report = self.report()
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        metric('last_run_timestamp_seconds', 'gauge', 'Start time of the last run.', [('', report['started_at'])])
+        metric('run_duration_seconds', 'gauge', 'Wall time of the last run.', [('', report['elapsed_s'])])
+        metric('files_processed', 'gauge', 'PPTX files processed in the last run.', [('', report['files'])])
+        metric('images_processed', 'gauge', 'Candidate images processed in the last run.', [('', report['images'])])
+        metric('images_saved', 'gauge', 'New images saved in the last run.', [('', report['images_saved'])])
+        metric('duplicates_skipped', 'gauge', 'Duplicate images skipped in the last run.',
+               [('', report['duplicates_skipped'])])
+        metric('bytes_read', 'gauge', 'PPTX bytes read in the last run.', [('', report['bytes_read'])])
+        metric('files_per_second', 'gauge', 'PPTX files processed per second.', [('', report['files_per_sec'])])
+        metric('images_per_second', 'gauge', 'Images processed per second.', [('', report['images_per_sec'])])
+        decode = report['stages'].get('decode', {'count': 0, 'total_ms': 0.0})
+        metric('decode_milliseconds', 'summary', 'Per-image decode and hash time in the last run.',
+               [('{quantile="0.5"}', report['decode_ms_p50']), ('{quantile="0.95"}', report['decode_ms_p95']),
+                ('_sum', decode['total_ms']), ('_count', decode['count'])])
+        metric('stage_milliseconds_total', 'counter', 'Total time spent per stage in the last run.',
+               [(f'{{stage="{stage}"}}', values['total_ms']) for stage, values in sorted(report['stages'].items())])
+        write_atomic(path, '\n'.join(lines) + '\n')
+
+
+def write_atomic(path, text):
+    # 先写临时文件再替换，监控程序不会读到写了一半的文件
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
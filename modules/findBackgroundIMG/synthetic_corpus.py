@@ -0,0 +1,102 @@
+# synthetic_corpus.py
+import hashlib
+import io
+import logging
+import os
+import random
+
+import numpy as np
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Emu, Inches
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def make_image(seed, size, image_format='JPEG'):
+    """生成确定性的测试图片字节：低分辨率随机色块放大后叠加噪声，不同 seed 的感知哈希互不相同。seed 可以是字符串。"""
+    rng = np.random.default_rng(int.from_bytes(hashlib.blake2b(str(seed).encode(), digest_size=8).digest(), 'big'))
+    width, height = size
+    coarse = Image.fromarray(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8))
+    img = coarse.resize((width, height), Image.BILINEAR)
+    noise = rng.integers(-12, 13, (height, width, 3))
+    pixels = np.clip(np.asarray(img, dtype=np.int16) + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=image_format, quality=85)
+    return buffer.getvalue()
+
+
+class SyntheticCorpus:
+    """
+    功能：按固定的随机种子生成用于性能测试的PPTX文件集：每个演示文稿包含若干铺满幻灯片的背景图片和若干小图标，
+    一部分背景图片（duplicate_ratio）取自所有文件共用的图片池，用于模拟跨文件重复的素材。
+    相同参数生成的幻灯片结构和图片内容完全相同（压缩包中的时间戳除外），可以在不同版本之间比较提取性能。
+    与其他对象的关系：benchmark.run_benchmarks 用它生成测试数据，再分别运行 ImageProcessor 和 findBackgroudIMG_V2.main。
+    """
+
+    def __init__(self, decks=20, slides_per_deck=10, backgrounds_per_deck=5, icons_per_deck=10, duplicate_ratio=0.3,
+                 shared_pool_size=20, background_size=(1600, 900), icon_size=(96, 96), subfolders=4, seed=0):
+        self.decks = decks
+        self.slides_per_deck = slides_per_deck
+        self.backgrounds_per_deck = min(backgrounds_per_deck, slides_per_deck)
+        self.icons_per_deck = icons_per_deck
+        self.duplicate_ratio = duplicate_ratio
+        self.shared_pool_size = max(1, shared_pool_size)
+        self.background_size = background_size
+        self.icon_size = icon_size
+        self.subfolders = max(1, subfolders)
+        self.seed = seed
+        self.shared_pool = {}  # 共用图片池，按需生成
+
+    def shared_background(self, index):
+        if index not in self.shared_pool:
+            self.shared_pool[index] = make_image(f"{self.seed}-shared-{index}", self.background_size)
+        return self.shared_pool[index]
+
+    def build_deck(self, deck_idx, pptx_path):
+        """生成一个演示文稿，返回 (背景图片数, 其中取自共用图片池的数量, 图标数)。"""
+        rng = random.Random(f"{self.seed}-deck-{deck_idx}")
+        presentation = Presentation()
+        presentation.slide_width = Inches(13.333)
+        presentation.slide_height = Inches(7.5)
+        blank_layout = presentation.slide_layouts[6]
+        slides = [presentation.slides.add_slide(blank_layout) for _ in range(self.slides_per_deck)]
+
+        shared = 0
+        for background_idx, slide in enumerate(rng.sample(slides, self.backgrounds_per_deck)):
+            if rng.random() < self.duplicate_ratio:
+                blob = self.shared_background(rng.randrange(self.shared_pool_size))
+                shared += 1
+            else:
+                blob = make_image(f"{self.seed}-bg-{deck_idx}-{background_idx}", self.background_size)
+            slide.shapes.add_picture(io.BytesIO(blob), 0, 0, presentation.slide_width, presentation.slide_height)
+
+        for icon_idx in range(self.icons_per_deck):
+            slide = rng.choice(slides)
+            blob = make_image(f"{self.seed}-icon-{deck_idx}-{icon_idx}", self.icon_size, 'PNG')
+            left = Emu(rng.randrange(0, presentation.slide_width - Inches(1)))
+            top = Emu(rng.randrange(0, presentation.slide_height - Inches(1)))
+            slide.shapes.add_picture(io.BytesIO(blob), left, top, Inches(0.8), Inches(0.8))
+
+        presentation.save(pptx_path)
+        return self.backgrounds_per_deck, shared, self.icons_per_deck
+
+    def generate(self, out_folder):
+        """在 out_folder 下生成全部文件（分布在 subfolders 个子目录中），返回汇总信息。"""
+        summary = {'decks': 0, 'backgrounds': 0, 'shared_backgrounds': 0, 'icons': 0, 'bytes': 0}
+        for deck_idx in range(self.decks):
+            folder = os.path.join(out_folder, f"group_{deck_idx % self.subfolders:02d}")
+            os.makedirs(folder, exist_ok=True)
+            pptx_path = os.path.join(folder, f"deck_{deck_idx:05d}.pptx")
+            backgrounds, shared, icons = self.build_deck(deck_idx, pptx_path)
+            summary['decks'] += 1
+            summary['backgrounds'] += backgrounds
+            summary['shared_backgrounds'] += shared
+            summary['icons'] += icons
+            summary['bytes'] += os.path.getsize(pptx_path)
+        logging.info(f"Generated synthetic corpus in {out_folder}: {summary}")
+        return summary
+
+
+if __name__ == "__main__":
+    SyntheticCorpus(decks=50).generate("synthetic_corpus")
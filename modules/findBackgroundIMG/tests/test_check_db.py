@@ -0,0 +1,59 @@
+# test_check_db.py
+import os
+import sqlite3
+
+import pytest
+
+from modules.findBackgroundIMG import findBackgroudIMG_V2
+from modules.findBackgroundIMG.checkDB import IMAGE_EXTENSIONS, reconcile
+from modules.findBackgroundIMG.findBackgroundIMG_sqliteV1 import SQLiteManager
+from modules.findBackgroundIMG.synthetic_corpus import SyntheticCorpus, make_image
+
+
+def image_files(folder):
+    return sorted(name for name in os.listdir(folder) if os.path.splitext(name)[1] in IMAGE_EXTENSIONS)
+
+
+@pytest.fixture(params=[True, False], ids=['fast_path', 'python_pptx'])
+def imported_gallery(request, tmp_path):
+    """V2 提取结果导入数据库：跨文件的重复图片文件已被删除，CSV中它们的行排在保留下来的第一次出现之后。"""
+    src_folder, dest_folder = str(tmp_path / 'src'), str(tmp_path / 'dest')
+    SyntheticCorpus(decks=6, slides_per_deck=5, backgrounds_per_deck=4, icons_per_deck=1, duplicate_ratio=0.6,
+                    shared_pool_size=3, background_size=(320, 180), subfolders=2).generate(src_folder)
+    csv_path = os.path.join(dest_folder, 'image_ppt_mapping.csv')
+    findBackgroudIMG_V2.main(src_folder, dest_folder, csv_path, fast_path=request.param, thumbnails=False)
+    db_path = str(tmp_path / 'image_gallery.db')
+    db_manager = SQLiteManager(db_path)
+    db_manager.connect()
+    db_manager.create_table('image_ppt_mapping')
+    db_manager.import_csv_to_database(csv_path, 'image_ppt_mapping')
+    db_manager.close()
+    return db_path, dest_folder
+
+
+def test_reconcile_keeps_files_after_csv_import(imported_gallery):
+    db_path, dest_folder = imported_gallery
+    kept = image_files(dest_folder)
+
+    missing_files, orphan_files = reconcile(db_path, dest_folder, remove_orphans=True, dry_run=False)
+
+    assert image_files(dest_folder) == kept
+    assert missing_files == [] and orphan_files == []
+    conn = sqlite3.connect(db_path)
+    paths = [row[0] for row in conn.execute("SELECT img_path FROM image_ppt_mapping")]
+    conn.close()
+    assert paths and all(os.path.exists(path) for path in paths)
+
+
+def test_orphan_removal_is_dry_run_by_default(imported_gallery):
+    db_path, dest_folder = imported_gallery
+    orphan = os.path.join(dest_folder, 'orphan.png')
+    with open(orphan, 'wb') as f:
+        f.write(make_image('orphan', (32, 32), 'PNG'))
+
+    _, orphan_files = reconcile(db_path, dest_folder, remove_orphans=True)
+    assert orphan_files == [orphan]
+    assert os.path.exists(orphan)
+
+    reconcile(db_path, dest_folder, remove_orphans=True, dry_run=False)
+    assert not os.path.exists(orphan)
@@ -0,0 +1,28 @@
+# test_findBackgroudIMG_V2.py
+import os
+
+from modules.findBackgroundIMG import findBackgroudIMG_V2
+from modules.findBackgroundIMG.synthetic_corpus import SyntheticCorpus
+
+
+def run_main(src_folder, dest_folder, fast_path):
+    csv_path = os.path.join(dest_folder, 'image_ppt_mapping.csv')
+    findBackgroudIMG_V2.main(src_folder, dest_folder, csv_path, fast_path=fast_path)
+    with open(csv_path, encoding='utf-8') as f:
+        return f.read().replace(dest_folder, '<dest>'), sorted(os.listdir(dest_folder))
+
+
+def test_fast_and_python_pptx_paths_write_the_same_csv(tmp_path):
+    # 共用图片池很小，同一演示文稿中会多次出现同一张背景图片
+    src_folder = str(tmp_path / 'src')
+    SyntheticCorpus(decks=6, slides_per_deck=8, backgrounds_per_deck=6, icons_per_deck=2, duplicate_ratio=0.7,
+                    shared_pool_size=2, background_size=(320, 180), subfolders=1).generate(src_folder)
+
+    fast_csv, fast_files = run_main(src_folder, str(tmp_path / 'fast'), True)
+    slow_csv, slow_files = run_main(src_folder, str(tmp_path / 'slow'), False)
+
+    assert fast_csv == slow_csv
+    assert fast_files == slow_files
+    rows = fast_csv.splitlines()[1:]
+    image_files = [row.split(',')[1] for row in rows]
+    assert len(set(image_files)) < len(image_files)  # 重复出现的位置指向同一个文件
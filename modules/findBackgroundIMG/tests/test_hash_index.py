@@ -0,0 +1,87 @@
+# test_hash_index.py
+import random
+
+import pytest
+
+from modules.findBackgroundIMG.hash_index import HammingIndex, hamming_distance, hash_to_int
+
+
+def flip_bits(hash_int, count, rng, hash_bits=64):
+    for bit in rng.sample(range(hash_bits), count):
+        hash_int ^= 1 << bit
+    return hash_int
+
+
+def random_hashes(seed=0, clusters=60, per_cluster=6, max_flips=10, hash_bits=64):
+    """随机的聚类中心，加上与中心相差 0..max_flips 位的近邻，保证各个距离上都有结果。"""
+    rng = random.Random(seed)
+    hashes = set()
+    for _ in range(clusters):
+        centre = rng.getrandbits(hash_bits)
+        hashes.add(centre)
+        for _ in range(per_cluster):
+            hashes.add(flip_bits(centre, rng.randint(0, max_flips), rng, hash_bits))
+    return sorted(hashes)
+
+
+def brute_force(hashes, query, max_distance, width=16):
+    return sorted((hamming_distance(query, h), format(h, f'0{width}x'))
+                  for h in hashes if hamming_distance(query, h) <= max_distance)
+
+
+@pytest.mark.parametrize('chunks', [4, 8, 16])
+def test_query_matches_brute_force(chunks):
+    hashes = random_hashes()
+    index = HammingIndex(chunks=chunks)
+    for h in hashes:
+        index.add(format(h, '016x'), f"img_{h}")
+    rng = random.Random(1)
+    queries = rng.sample(hashes, 40) + [flip_bits(h, 3, rng) for h in rng.sample(hashes, 20)]
+    for max_distance in range(0, 11):
+        for query in queries:
+            results = index.query(query, max_distance)
+            assert [(d, hex_) for d, hex_, _ in results] == brute_force(hashes, query, max_distance)
+            for _, hex_, items in results:
+                assert items == [f"img_{int(hex_, 16)}"]
+
+
+def test_add_keeps_items_and_remove_drops_hash():
+    index = HammingIndex()
+    index.add('ffc3810000818181', 'a.png')
+    index.add(0xffc3810000818181, 'b.png')
+    index.add('ffc3810000818180')
+    assert len(index) == 2
+    assert 'ffc3810000818181' in index
+    assert index.query('ffc3810000818181', 0) == [(0, 'ffc3810000818181', ['a.png', 'b.png'])]
+    assert index.has_near_duplicate('ffc3810000818181', 1)
+
+    index.remove('ffc3810000818181')
+    index.remove('0000000000000000')  # 不存在的哈希被忽略
+    assert len(index) == 1
+    assert index.query('ffc3810000818181', 1) == [(1, 'ffc3810000818180', [])]
+    assert all(all(table.values()) for table in index.tables)
+
+
+def test_find_groups_is_transitive_closure():
+    hashes = random_hashes(seed=2, clusters=30, per_cluster=4, max_flips=6)
+    index = HammingIndex()
+    for h in hashes:
+        index.add(h)
+    max_distance = 5
+    groups = index.find_groups(max_distance)
+
+    # 与暴力求出的连通分量比较
+    remaining = set(hashes)
+    expected = []
+    while remaining:
+        stack = [remaining.pop()]
+        component = set(stack)
+        while stack:
+            current = stack.pop()
+            neighbours = {h for h in remaining if hamming_distance(current, h) <= max_distance}
+            remaining -= neighbours
+            component |= neighbours
+            stack.extend(neighbours)
+        if len(component) > 1:
+            expected.append(component)
+    assert sorted(sorted(map(hash_to_int, group)) for group in groups) == sorted(sorted(c) for c in expected)
@@ -0,0 +1,85 @@
+# test_hashing.py
+import io
+
+import imagehash
+import numpy as np
+import pytest
+from PIL import Image
+
+from modules.findBackgroundIMG.hashing import HashEngine
+from modules.findBackgroundIMG.run_stats import RunStats
+from modules.findBackgroundIMG.synthetic_corpus import make_image
+
+KINDS = ('ahash', 'dhash', 'phash')
+
+
+def gradient_png(size=(320, 200)):
+    width, height = size
+    x = np.linspace(0, 255, width)
+    y = np.linspace(0, 255, height)[:, None]
+    pixels = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                       np.full((height, width), 128)], axis=-1).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def rgba_png():
+    img = Image.open(io.BytesIO(make_image('rgba', (150, 150), 'PNG'))).convert('RGBA')
+    img.putalpha(128)
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+BLOBS = [
+    make_image('jpeg-large', (1600, 900)),
+    make_image('jpeg-small', (64, 48)),
+    make_image('png', (400, 300), 'PNG'),
+    make_image('gif', (120, 90), 'GIF'),
+    make_image('bmp', (33, 17), 'BMP'),
+    gradient_png(),
+    rgba_png(),
+]
+
+
+def expected_hashes(blob):
+    img = Image.open(io.BytesIO(blob))
+    return {'ahash': str(imagehash.average_hash(img)), 'dhash': str(imagehash.dhash(img)),
+            'phash': str(imagehash.phash(img))}
+
+
+@pytest.mark.parametrize('index', range(len(BLOBS)))
+def test_hash_blob_matches_imagehash(index):
+    engine = HashEngine(kinds=KINDS)
+    assert engine.hash_blob(BLOBS[index]) == expected_hashes(BLOBS[index])
+
+
+def test_batch_matches_single_images_and_skips_undecodable():
+    engine = HashEngine(kinds=KINDS)
+    blobs = BLOBS[:3] + [b'not an image'] + BLOBS[3:]
+    results = engine.hash_blobs(blobs)
+    assert results[3] is None
+    assert [r for i, r in enumerate(results) if i != 3] == [expected_hashes(blob) for blob in BLOBS]
+    assert engine.images == len(BLOBS)
+    assert engine.bytes == sum(len(blob) for blob in BLOBS)
+
+
+def test_reduced_decode_stays_close_to_full_decode():
+    full = HashEngine(kinds=('ahash',))
+    reduced = HashEngine(kinds=('ahash',), reduced=True)
+    for blob in BLOBS[:3]:
+        distance = imagehash.hex_to_hash(full.hash_blob(blob)['ahash']) - \
+                   imagehash.hex_to_hash(reduced.hash_blob(blob)['ahash'])
+        assert distance <= 4
+
+
+def test_stats_and_reset():
+    stats = RunStats()
+    engine = HashEngine(stats=stats)
+    engine.hash_blobs(BLOBS[:2] + [b'broken'])
+    assert stats.timings['decode'].count == 2
+    assert stats.counters['hashed_bytes'] == len(BLOBS[0]) + len(BLOBS[1])
+    assert engine.report()['images'] == 2
+    engine.reset()
+    assert (engine.images, engine.bytes, engine.seconds, engine.decode_seconds) == (0, 0, 0.0, 0.0)
@@ -0,0 +1,141 @@
+# test_pptx_media.py
+import io
+import zipfile
+
+import pytest
+from lxml import etree
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from pptx.oxml.ns import qn
+from pptx.util import Emu, Inches
+
+from modules.findBackgroundIMG.pptx_media import PPTXMediaReader
+from modules.findBackgroundIMG.synthetic_corpus import make_image
+from modules.findBackgroundIMG.utils import is_size_similar
+
+BACKGROUND_XML = ('<p:bg xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main" '
+                  'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+                  'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                  '<p:bgPr><a:blipFill><a:blip r:embed="{rId}"/><a:stretch><a:fillRect/></a:stretch></a:blipFill>'
+                  '<a:effectLst/></p:bgPr></p:bg>')
+
+
+def set_picture_background(part, blob):
+    """把 part（幻灯片或版式）的背景设为图片填充，python-pptx 没有提供这个接口。"""
+    _, rId = part.get_or_add_image_part(io.BytesIO(blob))
+    c_sld = part._element.find(qn('p:cSld'))
+    c_sld.insert(0, etree.fromstring(BACKGROUND_XML.format(rId=rId)))
+
+
+def move_first_slide_to_end(path):
+    """调整保存后的播放顺序（python-pptx 保存时会按顺序重新编号幻灯片部件），使 sldIdLst 的顺序与部件名的编号不同。"""
+    with zipfile.ZipFile(path) as source:
+        parts = {info: source.read(info.filename) for info in source.infolist()}
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info, data in parts.items():
+            if info.filename == 'ppt/presentation.xml':
+                root = etree.fromstring(data)
+                sld_id_lst = root.find(qn('p:sldIdLst'))
+                sld_id_lst.append(sld_id_lst[0])
+                data = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+            target.writestr(info, data)
+
+
+@pytest.fixture(scope='module')
+def deck_path(tmp_path_factory):
+    presentation = Presentation()
+    presentation.slide_width = Inches(13.333)
+    presentation.slide_height = Inches(7.5)
+    width, height = presentation.slide_width, presentation.slide_height
+    shared = make_image('shared', (800, 450))
+    slides = [presentation.slides.add_slide(presentation.slide_layouts[6]) for _ in range(4)]
+
+    slides[0].shapes.add_textbox(0, 0, Inches(2), Inches(1)).text = "标题"
+    slides[0].shapes.add_picture(io.BytesIO(shared), 0, 0, width, height)
+    slides[0].shapes.add_picture(io.BytesIO(make_image('icon-0', (64, 64), 'PNG')), Inches(1), Inches(1),
+                                 Inches(0.5), Inches(0.5))
+    slides[1].shapes.add_picture(io.BytesIO(make_image('large', (900, 600))), Emu(-100), 0, width + 200, height)
+    slides[1].shapes.add_picture(io.BytesIO(shared), 0, 0, width, height)  # 同一个媒体部件被引用两次
+    slides[2].shapes.add_shape(1, 0, 0, Inches(1), Inches(1))
+    group = slides[2].shapes.add_group_shape()
+    group.shapes.add_picture(io.BytesIO(make_image('grouped', (64, 64), 'PNG')), 0, 0, width, height)
+    slides[2].shapes.add_picture(io.BytesIO(make_image('png-bg', (320, 180), 'PNG')), 0, 0, width, height)
+    set_picture_background(slides[3].part, make_image('slide-bg', (320, 180)))
+    set_picture_background(presentation.slide_layouts[6].part, make_image('layout-bg', (320, 180)))
+
+    path = tmp_path_factory.mktemp('pptx') / 'deck.pptx'
+    presentation.save(path)
+    move_first_slide_to_end(path)
+    return str(path)
+
+
+def expected_pictures(path, is_candidate=None):
+    presentation = Presentation(path)
+    expected = []
+    for slide_idx, slide in enumerate(presentation.slides):
+        for shape_idx, shape in enumerate(slide.shapes):
+            if shape.shape_type != MSO_SHAPE_TYPE.PICTURE:
+                continue
+            if is_candidate is not None and not is_candidate(shape.width, shape.height, presentation.slide_width,
+                                                             presentation.slide_height):
+                continue
+            expected.append((slide_idx, shape_idx, shape.image.blob, shape.width, shape.height))
+    return expected
+
+
+@pytest.mark.parametrize('is_candidate', [None, is_size_similar])
+def test_pictures_match_python_pptx(deck_path, is_candidate):
+    with PPTXMediaReader(deck_path) as reader:
+        pictures = [(slide_idx, shape_idx, reader.read_media(media_part), width, height)
+                    for slide_idx, shape_idx, media_part, width, height in reader.iter_pictures(is_candidate)]
+    expected = expected_pictures(deck_path, is_candidate)
+    assert pictures == expected
+    assert len(expected) == (5 if is_candidate is None else 4)
+
+
+def test_repeated_picture_shares_media_part(deck_path):
+    with PPTXMediaReader(deck_path) as reader:
+        parts = [media_part for _, _, media_part, _, _ in reader.iter_pictures(is_size_similar)]
+    assert len(parts) == 4
+    assert len(set(parts)) == 3
+
+
+def test_slide_order_and_size(deck_path):
+    # 访问 python-pptx 的 slides 时部件会按播放顺序重新命名，这里直接比较压缩包中的部件名
+    presentation = Presentation(deck_path)
+    with PPTXMediaReader(deck_path) as reader:
+        assert reader.slide_part_names() == [f'ppt/slides/slide{n}.xml' for n in (2, 3, 4, 1)]
+        assert reader.slide_size() == (presentation.slide_width, presentation.slide_height)
+
+
+def test_backgrounds(deck_path):
+    with PPTXMediaReader(deck_path) as reader:
+        backgrounds = {label: reader.read_media(media_part) for label, media_part in reader.iter_backgrounds()}
+    assert backgrounds == {
+        '3_bg': make_image('slide-bg', (320, 180)),
+        'slideLayout7_bg': make_image('layout-bg', (320, 180)),
+    }
+
+
+def test_candidates_chosen_from_geometry_before_blobs(tmp_path):
+    presentation = Presentation()
+    width, height = presentation.slide_width, presentation.slide_height
+    background_slide, icon_slide = [presentation.slides.add_slide(presentation.slide_layouts[6]) for _ in range(2)]
+    background_slide.shapes.add_picture(io.BytesIO(make_image('background', (400, 300))), 0, 0, width, height)
+    background_slide.shapes.add_picture(io.BytesIO(make_image('icon-a', (64, 64), 'PNG')), 0, 0,
+                                        Inches(1), Inches(1))
+    icon_slide.shapes.add_picture(io.BytesIO(make_image('icon-b', (64, 64), 'PNG')), 0, 0, Inches(1), Inches(1))
+    path = str(tmp_path / 'deck.pptx')
+    presentation.save(path)
+
+    with PPTXMediaReader(path) as reader:
+        reads = []
+        read = reader.zip_file.read
+        reader.zip_file.read = lambda name: reads.append(name) or read(name)
+        pictures = list(reader.iter_pictures(is_size_similar))
+        # 只有满足尺寸条件的图片才解析关系文件，迭代过程中不读取任何图片数据
+        assert [(slide_idx, shape_idx) for slide_idx, shape_idx, _, _, _ in pictures] == [(0, 0)]
+        assert not [name for name in reads if name.startswith('ppt/media/')]
+        assert 'ppt/slides/_rels/slide1.xml.rels' in reads
+        assert 'ppt/slides/_rels/slide2.xml.rels' not in reads
+        assert reader.read_media(pictures[0][2]) == make_image('background', (400, 300))
@@ -0,0 +1,94 @@
+# test_run_journal.py
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from modules.findBackgroundIMG import findBackgroudIMG_V2
+from modules.findBackgroundIMG.run_journal import RunJournal
+from modules.findBackgroundIMG.synthetic_corpus import SyntheticCorpus
+
+
+def read_entries(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_after_clean_interrupt(tmp_path):
+    path = str(tmp_path / "run.csv.journal")
+    journal = RunJournal(path)
+    journal.start(20)
+    journal.mark_done("a.pptx", 120)
+    journal.mark_done("演示文稿.pptx", 250)
+    journal.file.close()
+
+    resumed = RunJournal(path)
+    assert resumed.resume() == {"a.pptx", "演示文稿.pptx"}
+    assert resumed.last_offset == 250
+    resumed.finish()
+    assert not resumed.exists()
+
+
+def test_resume_after_torn_write(tmp_path):
+    path = str(tmp_path / "run.csv.journal")
+    journal = RunJournal(path)
+    journal.start(20)
+    journal.mark_done("a.pptx", 120)
+    journal.file.close()
+    with open(path, 'ab') as f:
+        f.write('{"pptx": "演示'.encode('utf-8')[:-1])  # 中断在一个多字节字符中间
+
+    resumed = RunJournal(path)
+    assert resumed.resume() == {"a.pptx"}
+    assert resumed.last_offset == 120
+    resumed.mark_done("b.pptx", 300)
+    resumed.file.close()
+
+    # 截断后追加的记录是完整的行，再次中断后仍然能读到
+    assert [entry.get('pptx') for entry in read_entries(path)] == [None, "a.pptx", "b.pptx"]
+    again = RunJournal(path)
+    assert again.resume() == {"a.pptx", "b.pptx"}
+    assert again.last_offset == 300
+    again.file.close()
+
+
+def test_resume_stops_at_corrupt_line(tmp_path):
+    path = str(tmp_path / "run.csv.journal")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"started": 1, "offset": 20}\n{"pptx": "a.pptx", "offset": 120}\n{"pptx": \n'
+                '{"pptx": "b.pptx", "offset": 300}\n')
+
+    journal = RunJournal(path)
+    assert journal.resume() == {"a.pptx"}
+    assert journal.last_offset == 120
+    journal.mark_done("c.pptx", 400)
+    journal.file.close()
+    assert [entry.get('pptx') for entry in read_entries(path)] == [None, "a.pptx", "c.pptx"]
+
+
+@pytest.mark.parametrize('csv_state', ['missing', 'short'])
+def test_main_starts_fresh_when_csv_does_not_match_journal(tmp_path, csv_state):
+    src_folder, dest_folder = str(tmp_path / 'src'), str(tmp_path / 'dest')
+    SyntheticCorpus(decks=3, slides_per_deck=3, backgrounds_per_deck=2, icons_per_deck=1,
+                    background_size=(320, 180)).generate(src_folder)
+    csv_path = os.path.join(dest_folder, 'image_ppt_mapping.csv')
+    findBackgroudIMG_V2.main(src_folder, dest_folder, csv_path, thumbnails=False)
+    expected = pd.read_csv(csv_path)
+
+    # 上一次运行留下的进度记录，但CSV已被删除或没有完整落盘
+    journal = RunJournal(f"{csv_path}.journal")
+    journal.start(40)
+    journal.mark_done(os.path.join(src_folder, 'group_00', 'deck_00000.pptx'), 4000)
+    journal.file.close()
+    if csv_state == 'missing':
+        os.remove(csv_path)
+    else:
+        with open(csv_path, 'r+b') as csv_file:
+            csv_file.truncate(100)
+
+    findBackgroudIMG_V2.main(src_folder, dest_folder, csv_path, thumbnails=False, resume=True)
+    result = pd.read_csv(csv_path)
+    assert sorted(result['Image Hash']) == sorted(expected['Image Hash'])
+    assert set(result['PPTX File']) == set(expected['PPTX File'])
+    assert not journal.exists()
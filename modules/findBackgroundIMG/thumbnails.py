@@ -0,0 +1,48 @@
+# thumbnails.py
+import os
+
+from PIL import Image
+
+# 缩略图尺寸名称 -> 最长边像素，从大到小排列，小图由上一级缩略图生成
+THUMBNAIL_SIZES = {
+    'medium': 400,
+    'small': 200,
+}
+
+
+class ThumbnailStore:
+    """
+    功能：提取图片时生成多级缩略图（默认 medium 400px、small 200px），按图片哈希分片保存在
+    root/<尺寸>/<哈希前两位>/<哈希三四位>/<哈希>.jpg，避免单个目录中文件过多。
+    与其他对象的关系：ImageManager 和 findBackgroudIMG_V2.write_image 在保存新图片时调用 save_thumbnails，
+    并把小尺寸缩略图路径写入图库数据库（thumb_small 列）或CSV（Thumbnail File 列）；gallery_view.AsyncThumbnailLoader、
+    UI_tk_v3 和 webApplication 优先加载这个缩略图，缩略图缺失时才解码原图。
+    """
+
+    def __init__(self, root, sizes=None, image_format='JPEG', quality=80):
+        self.root = root
+        self.sizes = dict(sorted((sizes or THUMBNAIL_SIZES).items(), key=lambda item: -item[1]))
+        self.image_format = image_format
+        self.quality = quality
+        self.extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+
+    def thumbnail_path(self, key, size_name):
+        return os.path.join(self.root, size_name, key[:2], key[2:4], f"{key}.{self.extension}")
+
+    def save_thumbnails(self, img, key):
+        """为 img 生成所有尺寸的缩略图，返回 {尺寸名称: 路径}。已经存在的缩略图不会重新生成。"""
+        paths = {size_name: self.thumbnail_path(key, size_name) for size_name in self.sizes}
+        if all(os.path.exists(path) for path in paths.values()):
+            return paths
+
+        thumb = img if img.mode in ('RGB', 'L') else img.convert('RGB')
+        for size_name, max_side in self.sizes.items():
+            thumb = thumb.copy()
+            thumb.thumbnail((max_side, max_side), Image.LANCZOS)
+            path = paths[size_name]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，程序中断时不会留下不完整的缩略图
+            tmp_path = f"{path}.tmp"
+            thumb.save(tmp_path, format=self.image_format, quality=self.quality)
+            os.replace(tmp_path, path)
+        return paths
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import subprocess
 import sys
@@ -41,6 +42,20 @@ def calculate_hash(image_blob):
         return None
 
 
+def blob_digest(blob):
+    """计算二进制数据的摘要（blake2b），用于在解码前判断图片字节是否完全相同。"""
+    return hashlib.blake2b(blob, digest_size=20).hexdigest()
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """分块读取文件并计算内容摘要（blake2b），用于判断文件内容是否变化。"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def is_size_similar(img_width, img_height, slide_width, slide_height):
     """判断图片尺寸是否符合要求。"""
     tolerance = 500
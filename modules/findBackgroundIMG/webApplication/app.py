@@ -1,25 +1,189 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request, send_file, abort
+from bisect import bisect_right
 import csv
+import os
+import sqlite3
+import sys
+import threading
+
+from modules.findBackgroundIMG.deck_index import gallery_images
+
+# index.html 与本文件放在同一目录
+app = Flask(__name__, template_folder='.')
+
+CSV_FILE_PATH = 'source/image_ppt_mapping.csv'
+DEFAULT_PAGE_SIZE = 60
+MAX_PAGE_SIZE = 200
 
-app = Flask(__name__)
 
 def load_images_from_csv(csv_file_path):
+    """按 img_hash 合并CSV中的记录；每张图片的 id 就是 img_hash。提取程序每次运行都会重写CSV，行号会变化，
+    而同一张图片的 img_hash 不变，图片地址和游标在CSV重写后仍然指向同一张图片。"""
     images = {}
     with open(csv_file_path, newline='', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
             img_hash = row['Image Hash']
             if img_hash not in images:
-                images[img_hash] = {'img_path': row['Image File'], 'pptx_paths': [row['PPTX File']]}
+                images[img_hash] = {'id': img_hash, 'img_hash': img_hash, 'img_path': row['Image File'],
+                                    'thumb_path': row.get('Thumbnail File') or None, 'pptx_paths': [row['PPTX File']]}
             else:
                 if row['PPTX File'] not in images[img_hash]['pptx_paths']:
                     images[img_hash]['pptx_paths'].append(row['PPTX File'])
     return list(images.values())
 
+
+def load_images_from_db(db_path, table_name='image_ppt_mapping'):
+    """从图库数据库读取图片列表，id 为图库表的主键；已确认无法解码的图片不返回。"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return gallery_images(conn.cursor(), table_name, decodable_only=True)
+    finally:
+        conn.close()
+
+
+class GallerySnapshot:
+    """某一版本数据源的只读图片列表，按 id 升序排列。建好后不再修改，多个请求线程可以同时读取。
+    id 在数据库模式下为图库表的主键（整数），在CSV模式下为 img_hash（字符串）；by_id 以 id 的字符串形式为键，
+    id_type 用于把请求中的游标转换为同一类型。"""
+
+    def __init__(self, version, images, id_type=int):
+        self.version = version
+        self.id_type = id_type
+        self.images = sorted(images, key=lambda image: image['id'])
+        self.ids = [image['id'] for image in self.images]
+        self.by_id = {str(image['id']): image for image in self.images}
+        self.etag = f"{hash(version) & 0xffffffffffff:x}"
+
+    def page(self, page, per_page):
+        start = (page - 1) * per_page
+        return self.images[start:start + per_page]
+
+    def after(self, cursor, limit):
+        """id 大于 cursor 的前 limit 张图片；cursor 对应的图片被删除后仍然有效。"""
+        start = bisect_right(self.ids, cursor) if cursor is not None else 0
+        return self.images[start:start + limit]
+
+
+class GalleryIndex:
+    """
+    功能：进程内的图片索引，所有请求共用。数据源（CSV 或图库数据库）只在第一次请求和文件被修改后重新读取，
+    其余请求只做一次 os.stat。分页按下标切片，游标分页按 id 二分查找，都不随页码增大而变慢。
+    重新读取时持有锁，其他线程等待同一次读取完成，不会同时解析多次；读取完成后整体替换 GallerySnapshot，
+    每个请求只使用它开始时取得的那一个版本。
+    与其他对象的关系：数据来自 load_images_from_csv 或 load_images_from_db（deck_index.gallery_images），
+    与 UI_Qt_v1.py、UIforWindows.py 读取的是同一份数据。
+    """
+
+    def __init__(self, source_path, use_db=False):
+        self.source_path = source_path
+        self.use_db = use_db
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def source_version(self):
+        # WAL 模式下新写入的数据先在 -wal 文件中，主文件的修改时间不一定变化
+        paths = [self.source_path, f"{self.source_path}-wal"] if self.use_db else [self.source_path]
+        version = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                version.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                version.append(None)
+        return tuple(version)
+
+    def get(self):
+        version = self.source_version()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self.lock:
+            if self.snapshot is None or self.snapshot.version != version:
+                if self.use_db:
+                    images = load_images_from_db(self.source_path)
+                else:
+                    images = load_images_from_csv(self.source_path)
+                self.snapshot = GallerySnapshot(version, images, int if self.use_db else str)
+                app.logger.info(f"Loaded {len(images)} images from {self.source_path}.")
+            return self.snapshot
+
+
+gallery_index = GalleryIndex(CSV_FILE_PATH)
+
+
+def image_json(image):
+    # 列表中显示提取时生成的缩略图（thumb），点击后打开原图（src）
+    thumb = f"/image/{image['id']}/thumb" if image.get('thumb_path') else f"/image/{image['id']}"
+    return {'id': image['id'], 'img_hash': image['img_hash'], 'pptx_paths': image['pptx_paths'],
+            'src': f"/image/{image['id']}", 'thumb': thumb}
+
+
+def page_size_arg(name):
+    return max(1, min(request.args.get(name, DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+
+
+def conditional_json(snapshot, data):
+    # 同一版本的索引对同一请求返回相同内容，浏览器带 If-None-Match 再次请求时直接返回 304
+    response = jsonify(data)
+    response.set_etag(f"{snapshot.etag}-{request.query_string.decode()}")
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @app.route('/')
 def index():
-    images_data = load_images_from_csv('source/image_ppt_mapping.csv')
-    return render_template('index.html', images_data=images_data)
+    return render_template('index.html', page_size=DEFAULT_PAGE_SIZE)
+
+
+@app.route('/api/images')
+def api_images():
+    """按页码分页：/api/images?page=1&per_page=60。"""
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = page_size_arg('per_page')
+    snapshot = gallery_index.get()
+    total = len(snapshot.images)
+    return conditional_json(snapshot, {
+        'images': [image_json(image) for image in snapshot.page(page, per_page)],
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+    })
+
+
+@app.route('/api/images/cursor')
+def api_images_cursor():
+    """按游标分页：/api/images/cursor?after=<上一页返回的 next_cursor>&limit=60，没有更多图片时 next_cursor 为 null。"""
+    limit = page_size_arg('limit')
+    snapshot = gallery_index.get()
+    images = snapshot.after(request.args.get('after', type=snapshot.id_type), limit)
+    next_cursor = images[-1]['id'] if len(images) == limit else None
+    return conditional_json(snapshot, {'images': [image_json(image) for image in images], 'next_cursor': next_cursor})
+
+
+@app.route('/image/<image_id>')
+def image_file(image_id):
+    # 只提供索引中的图片文件，不接受任意路径
+    image = gallery_index.get().by_id.get(image_id)
+    if image is None or not os.path.isfile(image['img_path']):
+        abort(404)
+    return send_file(os.path.abspath(image['img_path']), max_age=86400, conditional=True)
+
+
+@app.route('/image/<image_id>/thumb')
+def thumbnail_file(image_id):
+    # 缩略图文件缺失时返回原图
+    image = gallery_index.get().by_id.get(image_id)
+    if image is None:
+        abort(404)
+    if image.get('thumb_path') and os.path.isfile(image['thumb_path']):
+        return send_file(os.path.abspath(image['thumb_path']), max_age=86400, conditional=True)
+    return image_file(image_id)
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # 默认读取CSV；加上 --db 时读取提取程序生成的图库数据库
+    if "--db" in sys.argv:
+        gallery_index = GalleryIndex("image_gallery.db", use_db=True)
+    app.run(debug=True, threaded=True)